@@ -0,0 +1,225 @@
+"""Splits a campaign-wide inclusion bubble budget across boundaries using each boundary's coverage curve."""
+
+import argparse
+import csv
+import heapq
+import os
+from collections import defaultdict
+
+import numpy as np
+
+from refinement import CoverageSamples, greedy_coverage_order
+
+CURVE_FIELDS = ['name', 'type', 'rank', 'bubble', 'net_coverage']
+
+
+def get_curves_path(output_type):
+    return f'output/{output_type}/curves.csv'
+
+
+def setup_curves_file(output_type):
+    """
+    Sets up and returns the coverage curve CSV file and its writer.
+
+    Args:
+        output_type (str): Type of output (e.g., 'constituencies' or 'wards')
+
+    Returns:
+        tuple: (curves_file, curves_writer)
+    """
+    curves_file = open(get_curves_path(output_type), 'w')
+    curves_writer = csv.writer(curves_file)
+    curves_writer.writerow(CURVE_FIELDS)
+    return curves_file, curves_writer
+
+
+def coverage_curve(boundary, inclusion_bubbles, exclusion_bubbles, net_coverage):
+    """
+    Orders a boundary's inclusion bubbles so each adds as much net coverage as possible, in a single
+    incremental pass, giving the net coverage achieved by the first k bubbles for every k.
+
+    Coverage is measured on sample points and scaled so the full set of bubbles gives the exact net coverage.
+
+    Args:
+        boundary: Shapely geometry object representing the boundary
+        inclusion_bubbles (list): List of inclusion bubble geometries
+        exclusion_bubbles (list): List of exclusion bubble geometries
+        net_coverage (float): Net coverage percentage of all the inclusion bubbles, from compute_coverage_stats
+
+    Returns:
+        tuple: (inclusion bubble indices in order, net coverage percentage after each)
+    """
+    circles = []
+    for bubble in inclusion_bubbles:
+        minx, miny, maxx, maxy = bubble.bounds
+        circles.append(((minx + maxx) / 2, (miny + maxy) / 2, (maxx - minx) / 2))
+
+    samples = CoverageSamples(boundary, exclusion_bubbles)
+    order, gains = ([], []) if len(samples.x) == 0 else greedy_coverage_order(samples, circles)
+    if not gains:
+        return list(range(len(circles))), [net_coverage] * len(circles)
+
+    # Bubbles that add nothing on top of the others go last
+    picked = set(order)
+    order += [i for i in range(len(circles)) if i not in picked]
+    covered = np.cumsum(gains)
+    curve = (covered * (net_coverage / covered[-1])).tolist()
+    return order, curve + [net_coverage] * (len(order) - len(curve))
+
+
+def read_curves(curves_path):
+    """
+    Reads the coverage curves written during a run.
+
+    Args:
+        curves_path (str): Path to curves.csv
+
+    Returns:
+        dict: Boundary name -> {'inclusion': [(bubble, net coverage)] in rank order, 'exclusion': [bubble]}
+    """
+    curves = defaultdict(lambda: {'inclusion': [], 'exclusion': []})
+    with open(curves_path) as f:
+        for row in csv.DictReader(f):
+            if row['type'] == 'inclusion':
+                curves[row['name']]['inclusion'].append((int(row['rank']), row['bubble'], float(row['net_coverage'])))
+            else:
+                curves[row['name']]['exclusion'].append(row['bubble'])
+    for curve in curves.values():
+        curve['inclusion'] = [(bubble, coverage) for _, bubble, coverage in sorted(curve['inclusion'])]
+    return dict(curves)
+
+
+def read_population(population_path):
+    """
+    Reads the population of each boundary from a CSV with name and population columns.
+
+    Args:
+        population_path (str): Path to the population CSV
+
+    Returns:
+        dict: Boundary name -> population
+    """
+    with open(population_path) as f:
+        return {row['name']: float(row['population']) for row in csv.DictReader(f) if row['population']}
+
+
+def allocate_budget(curves, budget, weights=None):
+    """
+    Splits a total number of inclusion bubbles across boundaries to maximise total weighted net coverage.
+
+    Each bubble goes to the boundary whose next bubble adds the most weighted coverage. Curves are
+    built greedily, so each boundary's gains only shrink and this gives the best split of the budget.
+
+    Args:
+        curves (dict): Boundary name -> curve, as returned by read_curves
+        budget (int): Total number of inclusion bubbles across all boundaries
+        weights (dict, optional): Boundary name -> weight, e.g. population; every boundary counts
+            equally if not given, which maximises mean net coverage
+
+    Returns:
+        dict: Boundary name -> number of inclusion bubbles allocated
+    """
+    # Weighted coverage added by each successive bubble of each boundary, worked out once per boundary
+    gains = {}
+    for name, curve in curves.items():
+        if curve['inclusion']:
+            weight = 1 if weights is None else weights.get(name, 0)
+            coverages = [coverage for _, coverage in curve['inclusion']]
+            gains[name] = (weight * np.diff(coverages, prepend=0)).tolist()
+
+    heap = [(-boundary_gains[0], name, 0) for name, boundary_gains in gains.items()]
+    heapq.heapify(heap)
+    counts = {name: 0 for name in curves}
+    for _ in range(budget):
+        if not heap:
+            break
+        _, name, count = heapq.heappop(heap)
+        counts[name] = count + 1
+        if count + 1 < len(gains[name]):
+            heapq.heappush(heap, (-gains[name][count + 1], name, count + 1))
+    return counts
+
+
+def write_allocation(output_directory, curves, counts):
+    """
+    Writes allocated_bubbles.csv, in the bubbles.csv format, and a per-boundary allocation.csv summary.
+
+    Boundaries allocated no inclusion bubbles are left out entirely, along with their exclusion bubbles.
+
+    Args:
+        output_directory (str): Run output directory, e.g. output/constituencies
+        curves (dict): Boundary name -> curve, as returned by read_curves
+        counts (dict): Boundary name -> number of inclusion bubbles allocated
+    """
+    with open(os.path.join(output_directory, 'allocated_bubbles.csv'), 'w') as bubbles_file, \
+            open(os.path.join(output_directory, 'allocation.csv'), 'w') as allocation_file:
+        bubbles_writer = csv.writer(bubbles_file)
+        bubbles_writer.writerow(['bubble', 'name', 'type'])
+        allocation_writer = csv.writer(allocation_file)
+        allocation_writer.writerow(['name', 'bubbles', 'net_coverage', 'all_bubbles', 'all_net_coverage'])
+
+        for name, curve in curves.items():
+            inclusion = curve['inclusion']
+            count = counts.get(name, 0)
+            allocation_writer.writerow([
+                name,
+                count,
+                inclusion[count - 1][1] if count else 0,
+                len(inclusion),
+                inclusion[-1][1] if inclusion else 0,
+            ])
+            if not count:
+                continue
+            for bubble, _ in inclusion[:count]:
+                bubbles_writer.writerow([bubble, name, 'inclusion'])
+            for bubble in curve['exclusion']:
+                bubbles_writer.writerow([bubble, name, 'exclusion'])
+
+
+def allocate(output_type, budget, population_path=None):
+    """
+    Allocates a campaign-wide inclusion bubble budget from a run's coverage curves and writes the result.
+
+    Args:
+        output_type (str): Type of output (e.g., 'constituencies' or 'wards')
+        budget (int): Total number of inclusion bubbles across all boundaries
+        population_path (str, optional): CSV of name and population, to maximise population covered
+            rather than mean net coverage
+    """
+    curves = read_curves(get_curves_path(output_type))
+    weights = None
+    if population_path:
+        weights = read_population(population_path)
+        missing = [name for name in curves if name not in weights]
+        if missing:
+            print(f'No population for {len(missing)} boundaries (e.g. {missing[0]}); they will get no bubbles')
+
+    counts = allocate_budget(curves, budget, weights)
+    write_allocation(f'output/{output_type}', curves, counts)
+
+    def objective(coverage_of):
+        total = 0
+        for name, curve in curves.items():
+            weight = 1 if weights is None else weights.get(name, 0)
+            total += weight * coverage_of(name, curve['inclusion']) / 100
+        return total if weights is not None else 100 * total / max(len(curves), 1)
+
+    allocated = objective(lambda name, inclusion: inclusion[counts[name] - 1][1] if counts[name] else 0)
+    unlimited = objective(lambda name, inclusion: inclusion[-1][1] if inclusion else 0)
+    used = sum(counts.values())
+    available = sum(len(curve['inclusion']) for curve in curves.values())
+    measure = 'population covered' if weights is not None else 'mean net coverage %'
+    print(
+        f'Allocated {used} of {available} inclusion bubbles to {sum(1 for count in counts.values() if count)} '
+        f'of {len(curves)} boundaries: {measure} {allocated:.2f} (all bubbles: {unlimited:.2f})'
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Split a campaign-wide inclusion bubble budget across the boundaries of a run')
+    parser.add_argument('--budget', type=int, required=True, help='Total number of inclusion bubbles across all boundaries')
+    parser.add_argument('--wards', action='store_true', help='Allocate across wards instead of constituencies')
+    parser.add_argument('--population', type=str, help='CSV with name and population columns, to maximise population covered')
+    args = parser.parse_args()
+
+    allocate('wards' if args.wards else 'constituencies', args.budget, args.population)
@@ -3,6 +3,7 @@ from shapely import union_all
 import matplotlib.pyplot as plt
 import numpy as np
 import os
+from array import array
 
 def get_statistics_row(boundary_name, coverage_percentage, bubblesData):
     """
@@ -78,22 +79,68 @@ def compute_coverage_stats(boundary, inclusion_bubbles, exclusion_bubbles):
     
     return coverage_stats
 
+class SummaryStatistics:
+    """
+    Streaming accumulator for the summary rows of statistics.csv.
+
+    Only the four coverage percentages of each boundary are kept (as packed doubles, for the exact
+    median and standard deviation), so memory does not grow with the boundaries' geometry.
+    """
+
+    STAT_TYPES = ['internal_inclusion', 'external_inclusion', 'exclusion', 'net']
+
+    def __init__(self):
+        self.values = {stat_type: array('d') for stat_type in self.STAT_TYPES}
+        self.totals = {stat_type: 0 for stat_type in self.STAT_TYPES}
+
+    def add(self, coverage_stats):
+        """
+        Adds one boundary's coverage statistics.
+
+        Args:
+            coverage_stats (dict): Coverage statistics as returned by compute_coverage_stats
+        """
+        for stat_type in self.STAT_TYPES:
+            self.values[stat_type].append(coverage_stats[stat_type])
+            self.totals[stat_type] += coverage_stats[stat_type]
+
+    def write(self, statistics_writer):
+        """
+        Writes summary statistics for inclusion, exclusion, and net coverage.
+
+        With no boundaries added, e.g. an empty queue, the summary rows are written with blank values.
+
+        Args:
+            statistics_writer: CSV writer object
+        """
+        statistics_writer.writerow(['', '', '', '', '', '', ''])
+        for stat_type in self.STAT_TYPES:
+            values = np.frombuffer(self.values[stat_type], dtype=np.float64)
+            if len(values) == 0:
+                for summary in ('mean', 'median', 'min', 'max', 'sigma'):
+                    statistics_writer.writerow([f'{stat_type}_{summary}', ''])
+                continue
+            statistics_writer.writerow([f'{stat_type}_mean', self.totals[stat_type] / len(values)])
+            statistics_writer.writerow([f'{stat_type}_median', np.median(values)])
+            statistics_writer.writerow([f'{stat_type}_min', values.min()])
+            statistics_writer.writerow([f'{stat_type}_max', values.max()])
+            statistics_writer.writerow([f'{stat_type}_sigma', np.std(values)])
+
+
 def write_summary_statistics(statistics_writer, statistics):
     """
     Writes summary statistics for inclusion, exclusion, and net coverage.
     
     Args:
         statistics_writer: CSV writer object
-        statistics (list): List of coverage statistics dictionaries
+        statistics: List of coverage statistics dictionaries, or a SummaryStatistics accumulator
     """
-    statistics_writer.writerow(['', '', '', '', ''])
-    for stat_type in ['internal_inclusion', 'external_inclusion', 'exclusion', 'net']:
-        values = [s[stat_type] for s in statistics]
-        statistics_writer.writerow([f'{stat_type}_mean', sum(values) / len(values)])
-        statistics_writer.writerow([f'{stat_type}_median', np.median(values)])
-        statistics_writer.writerow([f'{stat_type}_min', min(values)])
-        statistics_writer.writerow([f'{stat_type}_max', max(values)])
-        statistics_writer.writerow([f'{stat_type}_sigma', np.std(values)])
+    if not isinstance(statistics, SummaryStatistics):
+        summary = SummaryStatistics()
+        for coverage_stats in statistics:
+            summary.add(coverage_stats)
+        statistics = summary
+    statistics.write(statistics_writer)
 
 
 def create_boundary_visualization(boundary_name, boundary, inclusion_bubbles, exclusion_bubbles, coverage_stats, output_type):
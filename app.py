@@ -1,13 +1,47 @@
-from flask import Flask, render_template, send_from_directory
+from flask import Flask, render_template, send_from_directory, request, jsonify
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import csv
+import hashlib
+import json
+import math
 import os
 import argparse
+import threading
+import numpy as np
+import pyproj
+import shapely
+from shapely.geometry import shape
+from shapely.validation import make_valid
+
+from boundaries import get_boundary_sources
+from catalogue import get_catalogue, load_boundaries
+from bubble_generation import calculate_bubbles_with_exclusions, Deadline
+from analysis import compute_coverage_stats
+from circle_union import bubble_circles, compute_exact_coverage_stats
+from refinement import refine_bubbles
 
 app = Flask(__name__)
 
 # Global variable to store the region type
 region_type = 'constituencies'
 
+# Boundaries loaded at startup with --preload, by name and by code
+preloaded_boundaries = {}
+
+# Most recent /bubbles results, keyed by geometry hash and options
+RESULT_CACHE_SIZE = 256
+result_cache = OrderedDict()
+result_cache_lock = threading.Lock()
+
+DEFAULT_TIME_BUDGET = 60
+# Limits on what one request can ask of a worker; requests may ask for less time, not more
+max_time_budget = 300
+max_area_km2 = 20000
+worker_count = None
+executor = None
+executor_lock = threading.Lock()
+
 def load_statistics():
     statistics = []
     with open(f'output/{region_type}/statistics.csv', 'r') as f:
@@ -31,15 +65,221 @@ def index():
 def serve_image(filename):
     return send_from_directory(f'output/{region_type}/JPGs', filename + '.jpg')
 
+def preload_boundaries(use_wards):
+    """
+    Loads every boundary into memory so requests naming boundaries don't read the source files.
+
+    Args:
+        use_wards (bool): If True, loads ward boundaries; if False, constituency boundaries
+    """
+    sources, _ = get_boundary_sources(use_wards)
+    entries = get_catalogue(sources)
+    for entry, (name, boundary) in zip(entries, load_boundaries(entries)):
+        preloaded_boundaries[name] = boundary
+        if entry['code']:
+            preloaded_boundaries[entry['code']] = boundary
+    print(f'Preloaded {len(entries)} boundaries')
+
+def get_executor():
+    global executor
+    # Requests are handled on several threads, and each must not start a pool of its own
+    with executor_lock:
+        if executor is None:
+            executor = ProcessPoolExecutor(max_workers=worker_count)
+    return executor
+
+def to_british_national_grid(geometry):
+    """
+    Converts a GeoJSON geometry's WGS84 longitude/latitude coordinates to British National Grid metres.
+
+    Args:
+        geometry: Shapely geometry in WGS84
+
+    Returns:
+        Shapely geometry in EPSG:27700
+    """
+    transformer = pyproj.Transformer.from_crs("epsg:4326", "epsg:27700", always_xy=True)
+    return shapely.transform(geometry, lambda coordinates: np.column_stack(transformer.transform(coordinates[:, 0], coordinates[:, 1])))
+
+def parse_request_geometry(body):
+    """
+    Builds the area to fill from a request: a GeoJSON geometry, Feature or FeatureCollection and/or named preloaded boundaries, merged.
+
+    Args:
+        body (dict): Request JSON with optional 'geometry' and 'boundaries' keys
+
+    Returns:
+        Shapely geometry in EPSG:27700
+
+    Raises:
+        ValueError: If the request gives no area, an unknown boundary name, or a geometry without area
+            or larger than the largest area allowed
+    """
+    parts = []
+    geojson = body.get('geometry')
+    if geojson is not None:
+        if geojson.get('type') == 'FeatureCollection':
+            geometries = [feature['geometry'] for feature in geojson['features']]
+        elif geojson.get('type') == 'Feature':
+            geometries = [geojson['geometry']]
+        else:
+            geometries = [geojson]
+        parts += [to_british_national_grid(make_valid(shape(geometry))) for geometry in geometries]
+
+    for name in body.get('boundaries', []):
+        if not preloaded_boundaries:
+            raise ValueError('Boundary names can only be used when the app is started with --preload')
+        if name not in preloaded_boundaries:
+            raise ValueError(f'Unknown boundary {name!r}')
+        parts.append(preloaded_boundaries[name])
+
+    if not parts:
+        raise ValueError('Request must include a geometry and/or a list of boundaries')
+    geometry = make_valid(shapely.union_all(parts))
+    if geometry.area <= 0:
+        raise ValueError('Geometry has no area')
+    if geometry.area > max_area_km2 * 1e6:
+        raise ValueError(f'Geometry covers {geometry.area / 1e6:.0f} km², more than the {max_area_km2} km² allowed')
+    return geometry
+
+def parse_request_options(body):
+    """
+    Reads the placement options of a request, with defaults filled in so equal requests hash equally.
+
+    Args:
+        body (dict): Request JSON with an optional 'options' object
+
+    Returns:
+        dict: distance_field, refine, time_budget and exact_coverage options, with the time budget
+            reduced to the largest allowed
+
+    Raises:
+        ValueError: If the time budget isn't a positive number of seconds
+    """
+    options = body.get('options', {})
+    time_budget = float(options.get('time_budget', DEFAULT_TIME_BUDGET))
+    if not math.isfinite(time_budget) or time_budget <= 0:
+        raise ValueError('time_budget must be a positive number of seconds')
+    return {
+        'distance_field': bool(options.get('distance_field', False)),
+        'refine': bool(options.get('refine', False)),
+        'time_budget': min(time_budget, max_time_budget),
+        'exact_coverage': bool(options.get('exact_coverage', False)),
+    }
+
+def get_cache_key(geometry, options):
+    """
+    Hashes a geometry's content, independent of vertex order and starting point, together with the options.
+
+    Args:
+        geometry: Shapely geometry in EPSG:27700
+        options (dict): Placement options
+
+    Returns:
+        str: SHA-256 hex digest
+    """
+    digest = hashlib.sha256(shapely.to_wkb(shapely.normalize(shapely.set_precision(geometry, 0.01))))
+    digest.update(json.dumps(options, sort_keys=True).encode())
+    return digest.hexdigest()
+
+def generate_bubbles(boundary_wkb, options):
+    """
+    Runs bubble placement and coverage statistics for one area, in a worker process.
+
+    Args:
+        boundary_wkb (bytes): WKB of the area in EPSG:27700
+        options (dict): distance_field, refine, time_budget and exact_coverage options
+
+    Returns:
+        dict: Bubbles in the bubbles.csv format, coverage statistics and status
+    """
+    boundary = shapely.from_wkb(boundary_wkb)
+    deadline = Deadline(options['time_budget'])
+    inclusion_bubbles, inclusion_data, exclusion_bubbles, exclusion_data = calculate_bubbles_with_exclusions(
+        boundary, use_distance_field=options['distance_field'], deadline=deadline
+    )
+    if options['refine']:
+        inclusion_bubbles, inclusion_data = refine_bubbles(
+            boundary, boundary.buffer(500), inclusion_bubbles, inclusion_data, exclusion_bubbles,
+            deadline=deadline
+        )
+    if options['exact_coverage']:
+        coverage_stats = compute_exact_coverage_stats(
+            boundary, bubble_circles(inclusion_bubbles), bubble_circles(exclusion_bubbles)
+        )
+    else:
+        coverage_stats = compute_coverage_stats(boundary, inclusion_bubbles, exclusion_bubbles)
+
+    transformer = pyproj.Transformer.from_crs("epsg:27700", "epsg:4326")
+    bubbles = []
+    for bubble_type, data in (('inclusion', inclusion_data), ('exclusion', exclusion_data)):
+        for x, y, radius in data:
+            lat, long = transformer.transform(x, y)
+            bubbles.append({
+                'bubble': f'({lat}, {long}) +{radius}m',
+                'type': bubble_type,
+                'latitude': lat,
+                'longitude': long,
+                'radius': radius,
+            })
+
+    return {
+        'bubbles': bubbles,
+        'coverage': coverage_stats,
+        'status': 'cut_off' if deadline.reached else 'finished',
+    }
+
+@app.route('/bubbles', methods=['POST'])
+def bubbles():
+    """
+    Generates bubbles for a GeoJSON area (WGS84) and/or merged preloaded boundaries.
+
+    Finished results are cached by geometry content and options, so repeated requests return immediately.
+    Results cut off by the time budget aren't cached.
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    try:
+        geometry = parse_request_geometry(body)
+        options = parse_request_options(body)
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        return jsonify({'error': f'Invalid request: {e}'}), 400
+
+    cache_key = get_cache_key(geometry, options)
+    with result_cache_lock:
+        if cache_key in result_cache:
+            result_cache.move_to_end(cache_key)
+            return jsonify({**result_cache[cache_key], 'cached': True, 'key': cache_key})
+
+    result = get_executor().submit(generate_bubbles, shapely.to_wkb(geometry), options).result()
+    # A cut-off result depends on how fast the worker was, so a repeat request gets another try
+    if result['status'] == 'finished':
+        with result_cache_lock:
+            result_cache[cache_key] = result
+            while len(result_cache) > RESULT_CACHE_SIZE:
+                result_cache.popitem(last=False)
+    return jsonify({**result, 'cached': False, 'key': cache_key})
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Run Flask app for constituencies or wards')
     parser.add_argument('--wards', action='store_true', help='Use wards instead of constituencies')
+    parser.add_argument('--preload', action='store_true', help='Load all boundaries into memory so /bubbles requests can merge them by name or code')
+    parser.add_argument('--workers', type=int, help='Number of worker processes for /bubbles requests (default: one per CPU)')
+    parser.add_argument('--max-time-budget', type=float, default=max_time_budget, help=f'Largest time_budget, in seconds, a /bubbles request gets (default: {max_time_budget})')
+    parser.add_argument('--max-area', type=float, default=max_area_km2, help=f'Largest area, in km², a /bubbles request may ask for (default: {max_area_km2})')
     args = parser.parse_args()
     
     # Set region type based on command line argument
     region_type = 'wards' if args.wards else 'constituencies'
+    worker_count = args.workers
+    max_time_budget = args.max_time_budget
+    max_area_km2 = args.max_area
+    if args.preload:
+        preload_boundaries(args.wards)
     
     # Create templates directory if it doesn't exist
     if not os.path.exists('templates'):
         os.makedirs('templates')
-    app.run(debug=True)
+    # The reloader would run this script twice, preloading every boundary in both processes
+    app.run(debug=True, use_reloader=False)
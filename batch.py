@@ -0,0 +1,250 @@
+"""Batch engine: runs the bubble generation algorithm over many boundaries at once with vectorized shapely operations."""
+
+import numpy as np
+import shapely
+from shapely import union_all
+from shapely.geometry import Point
+
+from bubble_generation import BUBBLE_LIMIT
+
+
+def calculate_radius_upper_bounds(boundaries):
+    """
+    Vectorized calculate_radius_upper_bound for an array of boundaries.
+
+    Args:
+        boundaries (np.ndarray): Array of shapely geometries
+
+    Returns:
+        np.ndarray: Upper bound radius in meters for each boundary, rounded to nearest thousand
+    """
+    rectangles = shapely.minimum_rotated_rectangle(boundaries)
+    coordinates, index = shapely.get_coordinates(
+        shapely.get_exterior_ring(rectangles), return_index=True
+    )
+    first = np.searchsorted(index, np.arange(len(boundaries)))
+    corner0, corner1, corner2 = coordinates[first], coordinates[first + 1], coordinates[first + 2]
+
+    def edge_length(a, b):
+        dx = a[:, 0] - b[:, 0]
+        dy = a[:, 1] - b[:, 1]
+        return np.sqrt(dx * dx + dy * dy)
+
+    width = np.minimum(edge_length(corner0, corner1), edge_length(corner1, corner2))
+    return ((width // 2000) * 1000).astype(np.int64)
+
+
+def interpolate_along_rings(rings, steps):
+    """
+    Places points every `step` along each ring, matching np.arange(0, ring.length, step).
+
+    Args:
+        rings (np.ndarray): Array of shapely linear rings
+        steps (np.ndarray): Step size for each ring
+
+    Returns:
+        tuple: (array of shapely points, array of the ring index of each point)
+    """
+    lengths = shapely.length(rings)
+    counts = np.ceil(lengths / steps).astype(np.int64)
+    counts[lengths <= 0] = 0
+    ring_index = np.repeat(np.arange(len(rings)), counts)
+    position = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    distances = position * steps[ring_index]
+    return shapely.line_interpolate_point(rings[ring_index], distances), ring_index
+
+
+def generate_inclusion_bubbles_batch(boundaries, initial_radii, padding=0):
+    """
+    Vectorized generate_inclusion_bubbles: steps every boundary down through its radii in lockstep.
+
+    Args:
+        boundaries (np.ndarray): Array of shapely geometries
+        initial_radii (np.ndarray): Starting radius for each boundary
+        padding: Optional padding to apply to the boundaries (default: 0)
+
+    Returns:
+        tuple: (list of inclusion bubble geometry lists, list of inclusion bubble data lists [x, y, radius]),
+               one entry per boundary
+    """
+    count = len(boundaries)
+    radii = np.array(initial_radii, dtype=np.int64)
+    inclusion_bubbles = [[] for _ in range(count)]
+    inclusion_data = [[] for _ in range(count)]
+    bubble_counts = np.zeros(count, dtype=np.int64)
+    padded_boundaries = shapely.buffer(boundaries, padding, quad_segs=16) if padding else boundaries
+    shapely.prepare(padded_boundaries)
+
+    active = np.flatnonzero((radii > 0) & (bubble_counts < BUBBLE_LIMIT))
+    while len(active):
+        islands = shapely.buffer(padded_boundaries[active], -(radii[active] + 30))
+        has_island = ~shapely.is_empty(islands)
+        island_owner = active[has_island]
+
+        if len(island_owner):
+            polygons, polygon_index = shapely.get_parts(islands[has_island], return_index=True)
+            polygon_owner = island_owner[polygon_index]
+            rings = shapely.get_exterior_ring(polygons)
+
+            # calculate_step, per boundary
+            total_lengths = np.bincount(polygon_index, shapely.length(rings), minlength=len(island_owner))
+            owner_radii = radii[island_owner]
+            owner_counts = bubble_counts[island_owner]
+            iteration_bubble_counts = total_lengths / owner_radii
+            is_last_iteration = (owner_radii == 1000) | (
+                (owner_counts + iteration_bubble_counts) > BUBBLE_LIMIT
+            )
+            steps = np.where(
+                is_last_iteration, total_lengths / (BUBBLE_LIMIT - owner_counts), owner_radii
+            ).astype(float)
+
+            points, ring_index = interpolate_along_rings(rings, steps[polygon_index])
+            point_owner = polygon_owner[ring_index]
+            point_radii = radii[point_owner]
+            bubbles = shapely.buffer(points, point_radii, quad_segs=16)
+            is_contained = shapely.contains(padded_boundaries[point_owner], bubbles)
+
+            coordinates = shapely.get_coordinates(points[is_contained]).tolist()
+            for owner, bubble, (x, y), radius in zip(
+                point_owner[is_contained].tolist(), bubbles[is_contained], coordinates,
+                point_radii[is_contained].tolist()
+            ):
+                inclusion_bubbles[owner].append(bubble)
+                inclusion_data[owner].append([x, y, int(radius)])
+            bubble_counts += np.bincount(point_owner[is_contained], minlength=count)
+
+        radii[active] = np.where(
+            bubble_counts[active] > 0, (radii[active] // 1500) * 1000, radii[active] - 1000
+        )
+        active = np.flatnonzero((radii > 0) & (bubble_counts < BUBBLE_LIMIT))
+
+    return inclusion_bubbles, inclusion_data
+
+
+def create_minimum_bounding_circles(boundaries):
+    """
+    Vectorized create_minimum_bounding_circle.
+
+    Args:
+        boundaries (np.ndarray): Array of shapely geometries
+
+    Returns:
+        tuple: (array of circle geometries, list of bubble data [x, y, radius])
+    """
+    circles = shapely.minimum_bounding_circle(boundaries)
+    centroids = shapely.get_coordinates(shapely.centroid(circles)).tolist()
+    bounds = shapely.bounds(circles)
+    radii = ((bounds[:, 2] - bounds[:, 0]) / 2).tolist()
+    return circles, [[x, y, int(radius)] for (x, y), radius in zip(centroids, radii)]
+
+
+def generate_exclusion_bubbles_batch(boundaries):
+    """
+    Vectorized generate_exclusion_bubbles.
+
+    Args:
+        boundaries (np.ndarray): Array of shapely geometries
+
+    Returns:
+        tuple: (list of exclusion bubble geometry lists, list of exclusion bubble data lists [x, y, radius]),
+               one entry per boundary
+    """
+    exclusion_radius = 1000
+    exclusion_bubbles = [[] for _ in range(len(boundaries))]
+    exclusion_data = [[] for _ in range(len(boundaries))]
+
+    padded_boundaries = shapely.buffer(boundaries, 1000, quad_segs=16)
+    polygons, polygon_owner = shapely.get_parts(padded_boundaries, return_index=True)
+    is_polygon = shapely.get_type_id(polygons) == shapely.GeometryType.POLYGON
+    polygons, polygon_owner = polygons[is_polygon], polygon_owner[is_polygon]
+
+    rings = shapely.get_exterior_ring(polygons)
+    points, ring_index = interpolate_along_rings(rings, np.full(len(rings), exclusion_radius / 4))
+    bubbles = shapely.buffer(points, exclusion_radius, quad_segs=16)
+
+    for owner, bubble, (x, y) in zip(
+        polygon_owner[ring_index].tolist(), bubbles, shapely.get_coordinates(points).tolist()
+    ):
+        exclusion_bubbles[owner].append(bubble)
+        exclusion_data[owner].append([x, y, int(exclusion_radius)])
+
+    return exclusion_bubbles, exclusion_data
+
+
+def calculate_bubbles_batch(boundaries):
+    """
+    Batch equivalent of calculate_bubbles_with_exclusions, giving the same result for every boundary.
+
+    Args:
+        boundaries (list): List of shapely geometry objects
+
+    Returns:
+        list: One (inclusion bubbles, inclusion data, exclusion bubbles, exclusion data) tuple per boundary
+    """
+    boundaries = np.asarray(boundaries, dtype=object)
+    radii = calculate_radius_upper_bounds(boundaries)
+    inclusion_bubbles, inclusion_data = generate_inclusion_bubbles_batch(boundaries, radii, padding=500)
+
+    # Use minimum bounding circle as fallback if no bubbles were generated
+    empty = [i for i, bubbles in enumerate(inclusion_bubbles) if len(bubbles) == 0]
+    if empty:
+        circles, circle_data = create_minimum_bounding_circles(boundaries[empty])
+        for i, circle, data in zip(empty, circles, circle_data):
+            inclusion_bubbles[i] = [circle]
+            inclusion_data[i] = [data]
+
+    exclusion_bubbles, exclusion_data = generate_exclusion_bubbles_batch(boundaries)
+
+    return [
+        (
+            inclusion_bubbles[i][:BUBBLE_LIMIT],
+            inclusion_data[i][:BUBBLE_LIMIT],
+            exclusion_bubbles[i],
+            exclusion_data[i],
+        )
+        for i in range(len(boundaries))
+    ]
+
+
+def compute_coverage_stats_batch(boundaries, inclusion_bubble_lists, exclusion_bubble_lists):
+    """
+    Batch equivalent of compute_coverage_stats.
+
+    Args:
+        boundaries (list): List of shapely geometry objects
+        inclusion_bubble_lists (list): Inclusion bubble geometries for each boundary
+        exclusion_bubble_lists (list): Exclusion bubble geometries for each boundary
+
+    Returns:
+        list: Coverage statistics dict for each boundary
+    """
+    empty = Point(0, 0).buffer(0)
+    boundaries = np.asarray(boundaries, dtype=object)
+    inclusion_unions = np.array(
+        [union_all(bubbles) if bubbles else empty for bubbles in inclusion_bubble_lists], dtype=object
+    )
+    exclusion_unions = np.array(
+        [union_all(bubbles) if bubbles else empty for bubbles in exclusion_bubble_lists], dtype=object
+    )
+
+    internal_inclusion = shapely.intersection(inclusion_unions, boundaries)
+    boundary_areas = shapely.area(boundaries)
+    internal_inclusion_area = shapely.area(internal_inclusion)
+    external_inclusion_area = shapely.area(
+        shapely.difference(shapely.difference(inclusion_unions, boundaries), exclusion_unions)
+    )
+    exclusion_area = shapely.area(shapely.intersection(exclusion_unions, boundaries))
+    net_area = shapely.area(shapely.difference(internal_inclusion, exclusion_unions))
+
+    return [
+        {
+            "internal_inclusion": 100 * internal / area,
+            "external_inclusion": 100 * external / area,
+            "exclusion": 100 * exclusion / area,
+            "net": 100 * net / area,
+        }
+        for internal, external, exclusion, net, area in zip(
+            internal_inclusion_area.tolist(), external_inclusion_area.tolist(),
+            exclusion_area.tolist(), net_area.tolist(), boundary_areas.tolist()
+        )
+    ]
@@ -1,7 +1,11 @@
 import fiona
 import requests
 import zipfile
-import io
+import hashlib
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from urllib.request import url2pathname
 from shapely.geometry import shape
 from shapely.validation import make_valid
 import os
@@ -25,69 +29,297 @@ wales_shapefile_filename = 'Final Recs Shapefiles/Final Recommendations_region.s
 # wards_shapefile_filename = 'Wards_May_2024_Boundaries_UK_BSC_8498175397534686318.gpkg'
 wards_shapefile_filename = 'Wards_(May_2025)_Boundaries_UK_BFE_(V2)_BNG.gpkg'
 
+# Pinned SHA-256 digests of the downloads, keyed by the name each set of boundaries is stored under
+# in data/. A download without a pinned digest is checked against the digest recorded in
+# RECORDED_CHECKSUMS_PATH when it was first downloaded, or recorded there if it is the first.
+download_checksums = {
+    'england': None,
+    'scotland': None,
+    'wales': None,
+    'wards': None,
+}
 
-def download_and_extract(url, path):
+RECORDED_CHECKSUMS_PATH = os.path.join('data', 'download_checksums.csv')
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def resolve_source(url, filename, mirror=None):
+    """
+    Resolves where a download should be read from: a local mirror directory, a file:// URL or the network.
+
+    Args:
+        url (str): The upstream URL of the file
+        filename (str): The name of the file within the mirror directory
+        mirror (str, optional): Local directory or file:// URL holding pre-downloaded copies
+
+    Returns:
+        str: A local file path, or the URL if the file has to be fetched over HTTP
+    """
+    mirror = mirror or os.environ.get('BOUNDARY_MIRROR')
+    if mirror:
+        mirror_path = os.path.join(local_path(mirror), filename)
+        if not os.path.exists(mirror_path):
+            raise FileNotFoundError(f'{mirror_path} not found in mirror')
+        return mirror_path
+    if urlparse(url).scheme == 'file':
+        return local_path(url)
+    return url
+
+
+def local_path(location):
+    """
+    Converts a file:// URL to a local path, leaving plain paths untouched.
+
+    Args:
+        location (str): A path or file:// URL
+
+    Returns:
+        str: The local filesystem path
+    """
+    parsed = urlparse(location)
+    if parsed.scheme == 'file':
+        return url2pathname(parsed.path)
+    return location
+
+
+def sha256_of(filepath):
+    """
+    Computes the SHA-256 checksum of a file without reading it all into memory.
+
+    Args:
+        filepath (str): Path to the file
+
+    Returns:
+        str: Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_recorded_checksums():
+    """
+    Reads the digests recorded when each file was first downloaded.
+
+    Returns:
+        dict: File name -> SHA-256 hex digest
+    """
+    if not os.path.exists(RECORDED_CHECKSUMS_PATH):
+        return {}
+    with open(RECORDED_CHECKSUMS_PATH, newline='') as f:
+        return {row['file']: row['sha256'] for row in csv.DictReader(f)}
+
+
+def record_checksum(filename, sha256):
+    """
+    Records the digest of a downloaded file, replacing any earlier digest for it.
+
+    Args:
+        filename (str): Name of the file, without its directory
+        sha256 (str): Hex digest of the file contents
+    """
+    checksums = read_recorded_checksums()
+    checksums[filename] = sha256
+    os.makedirs(os.path.dirname(RECORDED_CHECKSUMS_PATH), exist_ok=True)
+    temporary_path = RECORDED_CHECKSUMS_PATH + '.tmp'
+    with open(temporary_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['file', 'sha256'])
+        writer.writerows(sorted(checksums.items()))
+    os.replace(temporary_path, RECORDED_CHECKSUMS_PATH)
+
+
+def verify_checksum(filepath, filename, expected_sha256=None, allow_unverified=False):
+    """
+    Verifies a downloaded file against its pinned or recorded SHA-256 checksum, removing it on mismatch.
+
+    Without a pinned digest, the digest recorded on the file's first download is used. If there is
+    none, this is the first download, and its digest is recorded for later ones to be checked against.
+
+    Args:
+        filepath (str): Path to the downloaded file
+        filename (str): Name the file is recorded under
+        expected_sha256 (str, optional): Pinned hex digest
+        allow_unverified (bool): If True, a file that doesn't match its recorded digest is accepted and
+            its digest recorded instead, e.g. after the upstream file is republished
+
+    Raises:
+        ValueError: If the checksum does not match and the file isn't allowed unverified
+    """
+    actual_sha256 = sha256_of(filepath)
+    recorded_sha256 = read_recorded_checksums().get(filename)
+    expected = expected_sha256 or recorded_sha256
+    if expected is None:
+        print(f'Recorded sha256 {actual_sha256} for {filename}; later downloads are checked against it')
+        record_checksum(filename, actual_sha256)
+        return
+    if actual_sha256 == expected:
+        return
+    if allow_unverified and expected_sha256 is None:
+        print(f'{filename} sha256 {actual_sha256} does not match the recorded {recorded_sha256}; recording the new digest')
+        record_checksum(filename, actual_sha256)
+        return
+    os.remove(filepath)
+    raise ValueError(
+        f'Checksum mismatch for {filepath}: expected {expected}, got {actual_sha256}'
+        + ('' if expected_sha256 else '; pass --allow-unverified-downloads if the source file has been republished')
+    )
+
+
+def stream_download(url, filepath, expected_sha256=None, mirror=None, allow_unverified=False):
+    """
+    Streams a file to disk in chunks, resuming a previous partial download with an HTTP Range request.
+
+    The file is written to a `.part` file alongside the destination and only moved into
+    place once it is complete and its checksum has been verified.
+
+    Args:
+        url (str): The URL of the file to download
+        filepath (str): Destination path of the downloaded file
+        expected_sha256 (str, optional): Expected SHA-256 hex digest of the file
+        mirror (str, optional): Local directory or file:// URL to copy the file from instead
+        allow_unverified (bool): If True, a file not matching its recorded digest is accepted
+    """
+    os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+    source = resolve_source(url, os.path.basename(filepath), mirror)
+    partial_path = filepath + '.part'
+
+    if source != url:
+        print(f'Copying {source} to {filepath}')
+        shutil.copyfile(source, partial_path)
+    else:
+        resume_from = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+        headers = {'Range': f'bytes={resume_from}-'} if resume_from else {}
+
+        print(f'Downloading {url}' + (f' (resuming from byte {resume_from})' if resume_from else ''))
+        with requests.get(url, headers=headers, stream=True, allow_redirects=True, timeout=60) as response:
+            if response.status_code == 416:
+                # The server has nothing past the end of the partial file, which is only complete if
+                # its size matches the full length the server reports
+                content_range = response.headers.get('Content-Range', '')
+                if content_range != f'bytes */{resume_from}':
+                    print(f'{partial_path} does not match the size of {url}, restarting the download')
+                    os.remove(partial_path)
+                    return stream_download(url, filepath, expected_sha256, mirror, allow_unverified)
+            else:
+                response.raise_for_status()
+                # Servers that ignore the Range header send the whole file again
+                mode = 'ab' if response.status_code == 206 else 'wb'
+                with open(partial_path, mode) as f:
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+
+    verify_checksum(partial_path, os.path.basename(filepath), expected_sha256, allow_unverified)
+    os.replace(partial_path, filepath)
+
+
+def shapefile_members(zip_file, shapefile_path):
+    """
+    Lists the archive members that make up a single shapefile (.shp, .shx, .dbf, .prj, ...).
+
+    Args:
+        zip_file (zipfile.ZipFile): The opened archive
+        shapefile_path (str): Path of the .shp file within the archive
+
+    Returns:
+        list: Names of the archive members sharing the shapefile's stem
+
+    Raises:
+        FileNotFoundError: If the archive has no files for the shapefile
+    """
+    stem = os.path.splitext(shapefile_path)[0]
+    members = [
+        name for name in zip_file.namelist()
+        if os.path.splitext(name)[0] == stem
+    ]
+    if not members:
+        raise FileNotFoundError(f'{shapefile_path} not found in {zip_file.filename}')
+    return members
+
+
+def download_and_extract(url, path, shapefile_path=None, expected_sha256=None, mirror=None, allow_unverified=False):
     """
     Downloads a zip file from a URL and extracts its contents to a specified path.
 
     Args:
         url (str): The URL of the zip file to download
         path (str): The relative path where the contents should be extracted
+        shapefile_path (str, optional): If given, only the files making up this shapefile are extracted
+        expected_sha256 (str, optional): Expected SHA-256 hex digest of the zip file
+        mirror (str, optional): Local directory or file:// URL holding a copy of `<path>.zip`
+        allow_unverified (bool): If True, a zip file not matching its recorded digest is accepted
     """
     filepath = os.path.join('data', path)
     if os.path.exists(filepath):
         print(f'{filepath} already exists')
         return
 
-    print(f'Downloading {url}')
-    response = requests.get(url)
+    zip_path = os.path.join('data', 'downloads', path + '.zip')
+    if not os.path.exists(zip_path):
+        stream_download(url, zip_path, expected_sha256, mirror, allow_unverified)
+
     print(f'Extracting to {filepath}')
-    zip_file = zipfile.ZipFile(io.BytesIO(response.content))
-    zip_file.extractall(filepath)
+    with zipfile.ZipFile(zip_path) as zip_file:
+        members = shapefile_members(zip_file, shapefile_path) if shapefile_path else None
+        zip_file.extractall(filepath, members=members)
 
 
-def download_to_file(url, path):
+def download_to_file(url, path, expected_sha256=None, mirror=None, allow_unverified=False):
     """
     Downloads a file from a URL and saves it directly to the specified path.
 
     Args:
         url (str): The URL of the file to download
         path (str): The relative path where the file should be saved
+        expected_sha256 (str, optional): Expected SHA-256 hex digest of the file
+        mirror (str, optional): Local directory or file:// URL holding a copy of the file
+        allow_unverified (bool): If True, a file not matching its recorded digest is accepted
     """
     filepath = os.path.join('data', path)
     if os.path.exists(filepath):
         print(f'{filepath} already exists')
         return
 
-    print(f'Downloading {url} to {path}')
-    response = requests.get(url, allow_redirects=True)
-    response.raise_for_status()
-
-    with open(filepath, 'wb') as f:
-        f.write(response.content)
+    stream_download(url, filepath, expected_sha256, mirror, allow_unverified)
 
 
-def create_boundary_list(shapefile_path, key1, key2=None):
+def iter_boundary_list(shapefile_path, key1, key2=None):
     """
-    Creates a list of boundary tuples from a shapefile, where each tuple contains a key and its corresponding shape.
+    Streams boundary tuples from a shapefile one feature at a time.
 
     Args:
         shapefile_path (str): Path to the shapefile
         key1 (str): Primary key field name in the shapefile properties
         key2 (str, optional): Secondary key field name to concatenate with key1
 
-    Returns:
-        list: List of tuples containing (key, shape) pairs
+    Yields:
+        tuple: (key, shape) pairs
     """
-    boundaries = []
     with fiona.open('data/' + shapefile_path) as boundaries_file:
         for boundary in boundaries_file:
             boundary_shape = make_valid(shape(boundary['geometry']))
             key = boundary.properties[key1]
             if key2:
                 key = key + ' ' + boundary.properties[key2]
-            boundaries.append((key, boundary_shape))
-        return boundaries
+            yield key, boundary_shape
+
+
+def create_boundary_list(shapefile_path, key1, key2=None):
+    """
+    Creates a list of boundary tuples from a shapefile, where each tuple contains a key and its corresponding shape.
+
+    Args:
+        shapefile_path (str): Path to the shapefile
+        key1 (str): Primary key field name in the shapefile properties
+        key2 (str, optional): Secondary key field name to concatenate with key1
+
+    Returns:
+        list: List of tuples containing (key, shape) pairs
+    """
+    return list(iter_boundary_list(shapefile_path, key1, key2))
 
 
 def get_output_directory(output_type, directory_type):
@@ -120,41 +352,79 @@ def setup_output_directories(output_type):
         os.makedirs(get_output_directory(output_type, 'CSVs'))
 
 
-def get_boundaries(use_wards):
+def download_constituencies(mirror=None, allow_unverified=False):
     """
-    Retrieves boundary data either for wards or constituencies.
+    Downloads and extracts the England, Scotland and Wales constituency shapefiles concurrently.
 
     Args:
-        use_wards (bool): If True, retrieves ward boundaries; if False, retrieves constituency boundaries
+        mirror (str, optional): Local directory or file:// URL holding england.zip, scotland.zip and wales.zip
+        allow_unverified (bool): If True, downloads not matching their recorded digests are accepted
+    """
+    downloads = [
+        (england_shapefile_url, 'england', england_shapefile_filename),
+        (scotland_shapefile_url, 'scotland', scotland_shapefile_filename),
+        (wales_shapefile_url, 'wales', wales_shapefile_filename),
+    ]
+    with ThreadPoolExecutor(max_workers=len(downloads)) as executor:
+        futures = [
+            executor.submit(
+                download_and_extract, url, path, shapefile_path, download_checksums[path], mirror, allow_unverified
+            )
+            for url, path, shapefile_path in downloads
+        ]
+        for future in futures:
+            future.result()
+
+
+def get_boundary_sources(use_wards, mirror=None, allow_unverified=False):
+    """
+    Downloads the boundary files if needed and describes where each set of boundaries is read from.
+
+    Args:
+        use_wards (bool): If True, uses ward boundaries; if False, uses constituency boundaries
+        mirror (str, optional): Local directory or file:// URL to read the source files from instead of the network
+        allow_unverified (bool): If True, downloads not matching the digests recorded on their first
+            download are accepted. Also enabled by setting BOUNDARY_ALLOW_UNVERIFIED
 
     Returns:
-        tuple: (list of boundary tuples, output type string)
+        tuple: (list of (shapefile path, key1, key2) tuples, output type string)
     """
+    allow_unverified = allow_unverified or bool(os.environ.get('BOUNDARY_ALLOW_UNVERIFIED'))
     if use_wards:
         wards_path = 'wards/' + wards_shapefile_filename
-        download_to_file(wards_shapefile_url, wards_path)
-        return create_boundary_list(wards_path, 'WD25CD', 'WD25NM'), 'wards'
+        download_to_file(wards_shapefile_url, wards_path, download_checksums['wards'], mirror, allow_unverified)
+        return [(wards_path, 'WD25CD', 'WD25NM')], 'wards'
     else:
-        download_and_extract(england_shapefile_url, 'england')
-        download_and_extract(scotland_shapefile_url, 'scotland')
-        download_and_extract(wales_shapefile_url, 'wales')
-
-        england_constituencies = create_boundary_list(
-            'england/' + england_shapefile_filename, 'Constituen'
-        )
-        scotland_constituencies = create_boundary_list(
-            'scotland/' + scotland_shapefile_filename, 'NAME'
-        )
-        wales_constituencies = create_boundary_list(
-            'wales/' + wales_shapefile_filename, 'Official_N'
-        )
-
+        download_constituencies(mirror, allow_unverified)
         return (
-            england_constituencies + scotland_constituencies + wales_constituencies,
+            [
+                ('england/' + england_shapefile_filename, 'Constituen', None),
+                ('scotland/' + scotland_shapefile_filename, 'NAME', None),
+                ('wales/' + wales_shapefile_filename, 'Official_N', None),
+            ],
             'constituencies',
         )
 
 
+def get_boundaries(use_wards, mirror=None, allow_unverified=False):
+    """
+    Retrieves boundary data either for wards or constituencies.
+
+    Args:
+        use_wards (bool): If True, retrieves ward boundaries; if False, retrieves constituency boundaries
+        mirror (str, optional): Local directory or file:// URL to read the source files from instead of the network
+        allow_unverified (bool): If True, downloads not matching their recorded digests are accepted
+
+    Returns:
+        tuple: (list of boundary tuples, output type string)
+    """
+    sources, output_type = get_boundary_sources(use_wards, mirror, allow_unverified)
+    boundaries = []
+    for shapefile_path, key1, key2 in sources:
+        boundaries += create_boundary_list(shapefile_path, key1, key2)
+    return boundaries, output_type
+
+
 def filter_boundaries(boundaries, region):
     """
     Filters boundaries to only include the specified region.
@@ -206,6 +476,8 @@ def setup_output_files(output_type):
             'external_inclusion_coverage',
             'exclusion_coverage',
             'net_coverage',
+            'status',
+            'runtime_seconds',
         ]
     )
 
@@ -1,8 +1,39 @@
 from shapely.geometry import Point, MultiPolygon, LineString
 from shapely import minimum_rotated_rectangle, buffer, is_empty, minimum_bounding_circle
 import numpy as np
+import time
+
+from distance_field import DistanceField
 
 BUBBLE_LIMIT = 200
+# Exclusion bubbles are 1km circles placed every 250m around a boundary's 1km buffer
+EXCLUSION_RADIUS = 1000
+EXCLUSION_STEP = EXCLUSION_RADIUS / 4
+
+
+class Deadline:
+    """
+    A time limit for bubble placement that remembers whether placement was cut off by it.
+    """
+
+    def __init__(self, seconds=None):
+        """
+        Args:
+            seconds (float, optional): Time allowed from now; None for no limit
+        """
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+        self.reached = False
+
+    def expired(self):
+        """
+        Checks whether the time limit has passed.
+
+        Returns:
+            bool: True once the time limit has passed
+        """
+        if self.expires_at is not None and time.monotonic() >= self.expires_at:
+            self.reached = True
+        return self.reached
 
 
 def calculate_radius_upper_bound(boundary):
@@ -26,6 +57,21 @@ def calculate_radius_upper_bound(boundary):
     return int((width // 2000) * 1000)
 
 
+def calculate_radius_upper_bound_from_field(distance_field):
+    """
+    Calculates the maximum possible radius for bubbles from a boundary's distance field.
+
+    This is tighter than the minimum rotated rectangle bound, as it uses the largest inscribed circle.
+
+    Args:
+        distance_field (DistanceField): Distance field of the (padded) boundary
+
+    Returns:
+        int: Upper bound radius in meters, rounded down to the nearest thousand
+    """
+    return int(((distance_field.max_distance() - 30) // 1000) * 1000)
+
+
 def calculate_step(polygons, radius, bubble_length):
     """
     Calculates the step size between bubble centers based on the polygon length and bubble constraints.
@@ -51,7 +97,7 @@ def calculate_step(polygons, radius, bubble_length):
     return step
 
 
-def generate_inclusion_bubbles(boundary, initial_radius, padding=0):
+def generate_inclusion_bubbles(boundary, initial_radius, padding=0, distance_field=None, deadline=None):
     """
     Generate bubbles using the large radius approach (stepping down from initial radius).
 
@@ -59,6 +105,9 @@ def generate_inclusion_bubbles(boundary, initial_radius, padding=0):
         boundary: A shapely geometry object representing the boundary
         initial_radius: Starting radius for bubble generation
         padding: Optional padding to apply to the boundary (default: 0)
+        distance_field (DistanceField, optional): Distance field of the padded boundary; if given, the
+            island of possibility for each radius is read from it instead of buffering the boundary
+        deadline (Deadline, optional): Stop placing bubbles once this passes, keeping those placed so far
 
     Returns:
         tuple: (list of inclusion bubble geometries, list of inclusion bubble data [x, y, radius])
@@ -69,7 +118,14 @@ def generate_inclusion_bubbles(boundary, initial_radius, padding=0):
     padded_boundary = boundary.buffer(padding) if padding else boundary
 
     while radius > 0 and len(inclusion_bubbles) < BUBBLE_LIMIT:
-        island_of_possibility = buffer(padded_boundary, -(radius + 30))
+        if deadline is not None and deadline.expired():
+            print(f"   Time budget reached with {len(inclusion_bubbles)} inclusion bubbles")
+            break
+
+        if distance_field is not None:
+            island_of_possibility = distance_field.island(radius + 30)
+        else:
+            island_of_possibility = buffer(padded_boundary, -(radius + 30))
 
         if not is_empty(island_of_possibility):
             print(f"   Using radius {radius}m to generate inclusion bubbles")
@@ -82,11 +138,13 @@ def generate_inclusion_bubbles(boundary, initial_radius, padding=0):
             step = calculate_step(polygons, radius, len(inclusion_bubbles))
             for polygon in polygons:
                 for interpolation in np.arange(0, polygon.exterior.length, step):
+                    if deadline is not None and deadline.expired():
+                        break
                     point = polygon.exterior.interpolate(interpolation)
                     bubble = point.buffer(radius)
                     if padded_boundary.contains(bubble):
                         inclusion_bubbles.append(bubble)
-                        inclusion_data.append([point.x, point.y, int(radius / 1000)])
+                        inclusion_data.append([point.x, point.y, int(radius)])
 
         if len(inclusion_bubbles) > 0:
             radius = (radius // 1500) * 1000
@@ -131,7 +189,7 @@ def create_minimum_bounding_circle(boundary):
         boundary: A shapely geometry object representing the boundary
 
     Returns:
-        tuple: (bubble geometry, bubble data [x, y, radius])
+        tuple: (bubble geometry, bubble data [x, y, radius in meters])
     """
     circle = minimum_bounding_circle(boundary)
 
@@ -152,10 +210,10 @@ def generate_exclusion_bubbles(boundary):
     exclusion_data = []
 
     # Use a smaller radius for exclusion bubbles
-    exclusion_radius = 1000  # 1km radius for exclusion bubbles
+    exclusion_radius = EXCLUSION_RADIUS
 
     # Get the boundary exterior
-    padded_boundary = boundary.buffer(1000)
+    padded_boundary = boundary.buffer(exclusion_radius)
     polygons = (
         padded_boundary.geoms
         if isinstance(padded_boundary, MultiPolygon)
@@ -168,35 +226,67 @@ def generate_exclusion_bubbles(boundary):
 
         # Calculate step size based on the perimeter length
         perimeter = polygon.exterior.length
-        step = exclusion_radius / 4  # Some overlap
+        step = EXCLUSION_STEP  # Some overlap
 
         # Place exclusion bubbles along the perimeter
         for distance in np.arange(0, perimeter, step):
             point = polygon.exterior.interpolate(distance)
             bubble = point.buffer(exclusion_radius)
             exclusion_bubbles.append(bubble)
-            exclusion_data.append([point.x, point.y, int(exclusion_radius / 1000)])
+            exclusion_data.append([point.x, point.y, int(exclusion_radius)])
 
     return exclusion_bubbles, exclusion_data
 
 
-def calculate_bubbles_with_exclusions(boundary):
+def calculate_bubbles_with_exclusions(boundary, containment_margin=0, use_distance_field=False, deadline=None, exclusions=None):
     """
     Generate inclusion and exclusion bubbles for a boundary.
 
     Args:
         boundary: A shapely geometry object representing the boundary
+        containment_margin (float): How far, in meters, the boundary's outline may lie from the true
+            outline (e.g. after simplification). The padding inclusion bubbles may extend into is
+            reduced by this much so they stay within the padded true boundary.
+        use_distance_field (bool): Compute a distance field of the padded boundary once and derive the
+            radius upper bound and every radius's island of possibility from it
+        deadline (Deadline, optional): Time limit for the boundary, counting the exclusion bubbles and any
+            distance field against it. Inclusion bubbles are placed largest first, so the bubbles placed
+            when it passes are kept as the best set so far; check `deadline.reached` afterwards to see
+            whether placement was cut off
+        exclusions (tuple, optional): Precomputed (exclusion bubbles, exclusion data), e.g. generated
+            from the boundary before it was simplified, used instead of generating them from the boundary
 
     Returns:
         tuple: (list of inclusion bubble geometries, list of inclusion bubble data [x, y, radius],
                 list of exclusion bubble geometries, list of exclusion bubble data [x, y, radius])
     """
-    radius = calculate_radius_upper_bound(boundary)
-
-    # Generate inclusion bubbles with padding
-    inclusion_bubbles, inclusion_data = generate_inclusion_bubbles(
-        boundary, radius, padding=500
-    )
+    # Exclusion bubbles are always placed in full, as they keep the inclusion bubbles' overspill out of
+    # neighbouring areas. They are placed first so their time counts against the deadline and inclusion
+    # placement only gets what is left of it
+    if exclusions is not None:
+        exclusion_bubbles, exclusion_data = exclusions
+    else:
+        exclusion_bubbles, exclusion_data = generate_exclusion_bubbles(boundary)
+
+    padding = 500 - containment_margin
+    if deadline is not None and deadline.expired():
+        # Neither the distance field nor the padded boundary is worth building without time to use them
+        print("   Time budget reached before placing inclusion bubbles")
+        inclusion_bubbles, inclusion_data = [], []
+    elif use_distance_field:
+        padded_boundary = boundary.buffer(padding)
+        distance_field = DistanceField(padded_boundary)
+        radius = calculate_radius_upper_bound_from_field(distance_field)
+        inclusion_bubbles, inclusion_data = generate_inclusion_bubbles(
+            padded_boundary, radius, distance_field=distance_field, deadline=deadline
+        )
+    else:
+        radius = calculate_radius_upper_bound(boundary)
+
+        # Generate inclusion bubbles with padding
+        inclusion_bubbles, inclusion_data = generate_inclusion_bubbles(
+            boundary, radius, padding=padding, deadline=deadline
+        )
 
     # Use minimum bounding circle as fallback if no bubbles were generated
     if len(inclusion_bubbles) == 0:
@@ -204,9 +294,6 @@ def calculate_bubbles_with_exclusions(boundary):
         inclusion_bubbles = [bubble]
         inclusion_data = [bubble_data]
 
-    # Generate exclusion bubbles using the existing function
-    exclusion_bubbles, exclusion_data = generate_exclusion_bubbles(boundary)
-
     return (
         inclusion_bubbles[:BUBBLE_LIMIT],
         inclusion_data[:BUBBLE_LIMIT],
@@ -0,0 +1,227 @@
+"""Boundary catalogue: lists names, codes and bounding boxes so boundaries can be selected without decoding geometry."""
+
+import csv
+import fnmatch
+import os
+import re
+import tempfile
+
+import fiona
+from shapely.geometry import shape
+from shapely.validation import make_valid
+
+CATALOGUE_FIELDS = ['fid', 'name', 'code', 'minx', 'miny', 'maxx', 'maxy']
+
+
+def get_catalogue_path(shapefile_path):
+    """
+    Returns the path of the cached catalogue for a boundary file.
+
+    Args:
+        shapefile_path (str): Path to the boundary file, relative to data/
+
+    Returns:
+        str: Path to the catalogue CSV
+    """
+    return os.path.join('data', shapefile_path + '.catalogue.csv')
+
+
+def build_catalogue(shapefile_path, key1, key2=None):
+    """
+    Reads every feature of a boundary file once and writes its catalogue CSV.
+
+    The CSV is written to a temporary file and moved into place once complete, so an interrupted
+    build or another worker building the same catalogue never leaves a partial one behind.
+
+    Args:
+        shapefile_path (str): Path to the boundary file, relative to data/
+        key1 (str): Primary key field name in the shapefile properties
+        key2 (str, optional): Secondary key field name to concatenate with key1
+
+    Returns:
+        list: Catalogue entries for the file
+    """
+    catalogue_path = get_catalogue_path(shapefile_path)
+    print(f'Building catalogue {catalogue_path}')
+
+    descriptor, temporary_path = tempfile.mkstemp(
+        dir=os.path.dirname(catalogue_path), prefix=os.path.basename(catalogue_path) + '.', suffix='.tmp'
+    )
+    try:
+        with fiona.open('data/' + shapefile_path) as boundaries_file, os.fdopen(descriptor, 'w') as catalogue_file:
+            writer = csv.writer(catalogue_file)
+            writer.writerow(CATALOGUE_FIELDS)
+            for boundary in boundaries_file:
+                key = boundary.properties[key1]
+                code = ''
+                if key2:
+                    code = key
+                    key = key + ' ' + boundary.properties[key2]
+                writer.writerow([boundary.id, key, code, *shape(boundary['geometry']).bounds])
+        # mkstemp creates the file readable only by its owner; other machines' workers need to read it too
+        os.chmod(temporary_path, 0o644)
+        os.replace(temporary_path, catalogue_path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+    return read_catalogue(shapefile_path)
+
+
+def read_catalogue(shapefile_path):
+    """
+    Reads the cached catalogue for a boundary file.
+
+    Args:
+        shapefile_path (str): Path to the boundary file, relative to data/
+
+    Returns:
+        list: Catalogue entries, as dicts with source, fid, name, code and bounds keys
+    """
+    with open(get_catalogue_path(shapefile_path)) as catalogue_file:
+        return [
+            {
+                'source': shapefile_path,
+                'fid': int(row['fid']),
+                'name': row['name'],
+                'code': row['code'],
+                'bounds': (float(row['minx']), float(row['miny']), float(row['maxx']), float(row['maxy'])),
+            }
+            for row in csv.DictReader(catalogue_file)
+        ]
+
+
+def get_catalogue(sources):
+    """
+    Returns the catalogue for a set of boundary sources, building any that are missing or out of date.
+
+    Args:
+        sources (list): (shapefile path, key1, key2) tuples as returned by get_boundary_sources
+
+    Returns:
+        list: Catalogue entries in source order
+    """
+    catalogue = []
+    for shapefile_path, key1, key2 in sources:
+        catalogue_path = get_catalogue_path(shapefile_path)
+        is_stale = (
+            not os.path.exists(catalogue_path)
+            or os.path.getmtime(catalogue_path) < os.path.getmtime('data/' + shapefile_path)
+        )
+        if is_stale:
+            catalogue += build_catalogue(shapefile_path, key1, key2)
+        else:
+            catalogue += read_catalogue(shapefile_path)
+    return catalogue
+
+
+def read_name_file(name_file):
+    """
+    Reads a list of boundary names, one per line, ignoring blank lines and # comments.
+
+    Args:
+        name_file (str): Path to the file
+
+    Returns:
+        list: Names in the file
+    """
+    with open(name_file) as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines if line and not line.startswith('#')]
+
+
+def matches_name(entry, names):
+    """
+    Checks whether a catalogue entry matches any of the given names, codes or glob patterns.
+
+    Args:
+        entry (dict): Catalogue entry
+        names (list): Exact names, codes or glob patterns
+
+    Returns:
+        bool: True if the entry matches
+    """
+    for name in names:
+        if any(char in name for char in '*?['):
+            if fnmatch.fnmatchcase(entry['name'], name):
+                return True
+        elif name == entry['name'] or (entry['code'] and name == entry['code']):
+            return True
+    return False
+
+
+def intersects_bbox(entry, bbox):
+    """
+    Checks whether a catalogue entry's bounding box intersects a bounding box.
+
+    Args:
+        entry (dict): Catalogue entry
+        bbox (tuple): (minx, miny, maxx, maxy) in the boundary file's coordinates
+
+    Returns:
+        bool: True if the bounding boxes intersect
+    """
+    minx, miny, maxx, maxy = entry['bounds']
+    return minx <= bbox[2] and maxx >= bbox[0] and miny <= bbox[3] and maxy >= bbox[1]
+
+
+def select_entries(catalogue, names=None, regex=None, name_file=None, bbox=None):
+    """
+    Selects catalogue entries by name, code, glob pattern, regular expression, name-list file and/or bounding box.
+
+    Name, regular expression and name-file selections are combined; the bounding box then narrows the result.
+
+    Args:
+        catalogue (list): Catalogue entries
+        names (list, optional): Exact names, codes or glob patterns
+        regex (str, optional): Regular expression searched for in each name
+        name_file (str, optional): Path to a file with one name, code or pattern per line
+        bbox (tuple, optional): (minx, miny, maxx, maxy) bounding box filter
+
+    Returns:
+        list: Selected entries in catalogue order
+    """
+    names = list(names or [])
+    if name_file:
+        names += read_name_file(name_file)
+    pattern = re.compile(regex) if regex else None
+
+    selected = catalogue
+    if names or pattern:
+        selected = [
+            entry for entry in catalogue
+            if matches_name(entry, names) or (pattern and pattern.search(entry['name']))
+        ]
+    if bbox:
+        selected = [entry for entry in selected if intersects_bbox(entry, bbox)]
+
+    if not selected:
+        print('Error: No regions matched the selection')
+        print(f"Available regions: {[entry['name'] for entry in catalogue[:20]]}...")
+        return []
+
+    if len(selected) < len(catalogue):
+        print(f'Processing {len(selected)} selected regions (filtered from {len(catalogue)} regions)')
+    return selected
+
+
+def load_boundaries(entries):
+    """
+    Loads the geometry for each selected catalogue entry on demand.
+
+    Args:
+        entries (list): Catalogue entries
+
+    Yields:
+        tuple: (boundary name, boundary geometry)
+    """
+    open_files = {}
+    try:
+        for entry in entries:
+            if entry['source'] not in open_files:
+                open_files[entry['source']] = fiona.open('data/' + entry['source'])
+            boundary = open_files[entry['source']][entry['fid']]
+            yield entry['name'], make_valid(shape(boundary['geometry']))
+    finally:
+        for boundaries_file in open_files.values():
+            boundaries_file.close()
@@ -0,0 +1,409 @@
+"""Exact coverage statistics for true circles, from the arcs and segments bounding each covered region."""
+
+import math
+
+import numpy as np
+import shapely
+from shapely import STRtree, contains_xy, prepare
+from shapely.affinity import translate
+from shapely.geometry.polygon import orient
+
+# Circles and points closer than this, relative to the circles' size, to touching are treated as touching
+EPSILON = 1e-9
+# Angles of a non-crossing circle tested against the boundary, away from those a touching outline is likely at
+TEST_ANGLES = np.array([0.3, 2.4, 4.5])
+# Points along an arc between crossings tested against the boundary, away from its middle
+TEST_FRACTIONS = (0.382, 0.618)
+
+
+def bubble_circles(bubbles):
+    """
+    Recovers the circle each bubble polygon was buffered from.
+
+    Args:
+        bubbles (list): Bubble geometries, e.g. from Point.buffer or minimum_bounding_circle
+
+    Returns:
+        np.ndarray: (n, 3) array of x, y and radius in meters
+    """
+    if not bubbles:
+        return np.empty((0, 3))
+    bounds = shapely.bounds(np.asarray(bubbles, dtype=object))
+    return np.column_stack([
+        (bounds[:, 0] + bounds[:, 2]) / 2, (bounds[:, 1] + bounds[:, 3]) / 2, (bounds[:, 2] - bounds[:, 0]) / 2
+    ])
+
+
+def polygon_parts(geometry):
+    """
+    Lists the polygons of a geometry at any depth, ignoring any stray lines or points.
+
+    Args:
+        geometry: Shapely geometry, possibly a GeometryCollection from make_valid, which can nest a
+            MultiPolygon inside it
+
+    Returns:
+        np.ndarray: Polygon geometries
+    """
+    parts = shapely.get_parts(geometry)
+    while True:
+        is_multi = shapely.get_type_id(parts) >= shapely.GeometryType.MULTIPOINT
+        if not is_multi.any():
+            break
+        parts = np.concatenate([parts[~is_multi], shapely.get_parts(parts[is_multi])])
+    return parts[shapely.get_type_id(parts) == shapely.GeometryType.POLYGON]
+
+
+def boundary_segments(boundary):
+    """
+    Splits a boundary's rings into segments oriented with the boundary's interior on their left.
+
+    Args:
+        boundary: Shapely polygonal geometry, or a collection of geometries (e.g. from make_valid) whose
+            polygons, at any depth, are the boundary
+
+    Returns:
+        tuple: (start points, end points), each an (n, 2) array
+    """
+    polygons = [orient(polygon, 1.0) for polygon in polygon_parts(boundary)]
+    if not polygons:
+        return np.empty((0, 2)), np.empty((0, 2))
+    coordinates, ring_index = shapely.get_coordinates(shapely.get_rings(polygons), return_index=True)
+    same_ring = ring_index[:-1] == ring_index[1:]
+    return coordinates[:-1][same_ring], coordinates[1:][same_ring]
+
+
+def circle_boxes(circles):
+    return shapely.box(
+        circles[:, 0] - circles[:, 2], circles[:, 1] - circles[:, 2], circles[:, 0] + circles[:, 2], circles[:, 1] + circles[:, 2]
+    )
+
+
+def expand_candidates(piece_owner, pair_owner, pair_circle):
+    """
+    Lists the circles each piece could lie inside, from the circles whose bounding boxes meet the piece's owner.
+
+    Args:
+        piece_owner (np.ndarray): Circle or segment index each piece is part of
+        pair_owner (np.ndarray): Circle or segment index of each bounding box match
+        pair_circle (np.ndarray): Circle index of each bounding box match
+
+    Returns:
+        tuple: (piece index, circle index) of each piece and candidate circle
+    """
+    order = np.argsort(pair_owner, kind='stable')
+    pair_owner, pair_circle = pair_owner[order], pair_circle[order]
+    first = np.searchsorted(pair_owner, piece_owner, side='left')
+    counts = np.searchsorted(pair_owner, piece_owner, side='right') - first
+    piece = np.repeat(np.arange(len(piece_owner)), counts)
+    offsets = np.arange(len(piece)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return piece, pair_circle[np.repeat(first, counts) + offsets]
+
+
+def containing(circles, x, y, piece, candidate, selected):
+    """
+    Tests which points lie strictly inside any of a set of circles.
+
+    Args:
+        circles (np.ndarray): (n, 3) array of x, y and radius
+        x (np.ndarray): Point x coordinates
+        y (np.ndarray): Point y coordinates
+        piece (np.ndarray): Point index of each candidate, from expand_candidates
+        candidate (np.ndarray): Circle index of each candidate, from expand_candidates
+        selected (np.ndarray): True for the circles to test against, e.g. the inclusion bubbles
+
+    Returns:
+        np.ndarray: True for points inside a selected circle
+    """
+    result = np.zeros(len(x), dtype=bool)
+    keep = selected[candidate]
+    piece, candidate = piece[keep], candidate[keep]
+    dx = x[piece] - circles[candidate, 0]
+    dy = y[piece] - circles[candidate, 1]
+    result[piece[dx * dx + dy * dy < circles[candidate, 2] ** 2]] = True
+    return result
+
+
+def circle_circle_crossings(circles, first, second):
+    """
+    Finds the arc of each circle lying inside each other circle it crosses, and the circles lying wholly inside another.
+
+    Circles within EPSILON of touching don't cross: a circle touching another from inside is inside
+    it, one touching it from outside is outside it, and of two equal circles the later one is inside
+    the earlier, so exactly one of them is on the outline.
+
+    Args:
+        circles (np.ndarray): (n, 3) array of x, y and radius
+        first (np.ndarray): First circle index of each pair whose bounding boxes meet
+        second (np.ndarray): Second circle index of each pair whose bounding boxes meet
+
+    Returns:
+        tuple: (circle index, other circle index, angle the arc starts, angle it ends going anticlockwise)
+            of each arc, once for each of the two circles of a crossing pair, then
+            (circle index, other circle index) of each circle wholly inside another
+    """
+    keep = first != second
+    first, second = first[keep], second[keep]
+    x1, y1, r1 = circles[first].T
+    x2, y2, r2 = circles[second].T
+    distance = np.hypot(x2 - x1, y2 - y1)
+    tolerance = EPSILON * (r1 + r2)
+    equal = (distance <= tolerance) & (np.abs(r1 - r2) <= tolerance)
+    within = (distance + r1 <= r2 + tolerance) & ~(equal & (first < second))
+
+    # Each ordered pair is listed twice, so only work out each crossing from its first circle
+    crossing = (first < second) & (distance < r1 + r2 - tolerance) & (distance > np.abs(r1 - r2) + tolerance)
+    x1, y1, r1, x2, y2, r2, distance = (
+        values[crossing] for values in (x1, y1, r1, x2, y2, r2, distance)
+    )
+    along = (r1 * r1 - r2 * r2 + distance * distance) / (2 * distance)
+    across = np.sqrt(np.maximum(r1 * r1 - along * along, 0))
+    ux, uy = (x2 - x1) / distance, (y2 - y1) / distance
+    # Seen from the first circle, the crossing points are either side of the direction to the second
+    left_x, left_y = x1 + along * ux - across * uy, y1 + along * uy + across * ux
+    right_x, right_y = x1 + along * ux + across * uy, y1 + along * uy - across * ux
+    circle = np.concatenate([first[crossing], second[crossing]])
+    other = np.concatenate([second[crossing], first[crossing]])
+    enter = np.concatenate([np.arctan2(right_y - y1, right_x - x1), np.arctan2(left_y - y2, left_x - x2)])
+    leave = np.concatenate([np.arctan2(left_y - y1, left_x - x1), np.arctan2(right_y - y2, right_x - x2)])
+    return circle, other, enter, leave, first[within], second[within]
+
+
+def covered_arcs(arc_circle, arc_source, crossings, selections, count):
+    """
+    Tests which arcs lie inside any of some sets of other circles, by sweeping round each circle
+    counting the other circles' arcs it has entered and not yet left.
+
+    Args:
+        arc_circle (np.ndarray): Circle index of each arc, sorted by circle and then angle
+        arc_source (np.ndarray): Breakpoint each arc starts at, from split_into_pieces; the first
+            breakpoints must be the enter angles of the crossings, then their leave angles
+        crossings (tuple): Result of circle_circle_crossings
+        selections (list): Boolean arrays, True for the circles of each set, e.g. the inclusion bubbles
+        count (int): Number of circles
+
+    Returns:
+        list: For each set, True for arcs inside one of its circles
+    """
+    circle, other, enter, leave, inner, outer = crossings
+    from_crossing = arc_source < 2 * len(circle)
+    wraps = leave < enter
+
+    covered = []
+    for selected in selections:
+        keep = selected[other]
+        step = np.zeros(len(arc_source))
+        step[from_crossing] = np.concatenate([keep, -1.0 * keep])[arc_source[from_crossing]]
+        # Arcs that wrap round past pi are already entered at the start of the sweep
+        depth = np.bincount(circle[keep & wraps], minlength=count) + np.bincount(inner[selected[outer]], minlength=count)
+        # Every circle's steps add up to zero, so a running total over all circles is each circle's own count
+        covered.append(depth[arc_circle] + np.cumsum(step) > 0)
+    return covered
+
+
+def circle_segment_breakpoints(circles, starts, ends, circle_index, segment_index):
+    """
+    Finds where circles cross boundary segments.
+
+    A crossing at a segment's end is found on both segments meeting there, so rounding can't lose it
+    from both; the duplicate only adds a piece of zero length.
+
+    Args:
+        circles (np.ndarray): (n, 3) array of x, y and radius
+        starts (np.ndarray): (m, 2) segment start points
+        ends (np.ndarray): (m, 2) segment end points
+        circle_index (np.ndarray): Circle index of each circle and segment whose bounding boxes meet
+        segment_index (np.ndarray): Segment index of each circle and segment whose bounding boxes meet
+
+    Returns:
+        tuple: (circle index, angle on the circle, segment index, position along the segment from 0 to 1) of each crossing
+    """
+    cx, cy, r = circles[circle_index].T
+    x1, y1 = starts[segment_index].T
+    dx, dy = (ends[segment_index] - starts[segment_index]).T
+    fx, fy = x1 - cx, y1 - cy
+    a = dx * dx + dy * dy
+    b = 2 * (fx * dx + fy * dy)
+    c = fx * fx + fy * fy - r * r
+    discriminant = b * b - 4 * a * c
+    crossing = (discriminant > 0) & (a > 0)
+
+    circles_out, angles_out, segments_out, positions_out = [], [], [], []
+    root = np.sqrt(np.where(crossing, discriminant, 0))
+    for sign in (1, -1):
+        t = np.divide(-b + sign * root, 2 * a, out=np.full(len(a), -1.0), where=a > 0)
+        keep = crossing & (t >= -EPSILON) & (t <= 1 + EPSILON)
+        t = np.clip(t, 0, 1)
+        px = x1[keep] + t[keep] * dx[keep]
+        py = y1[keep] + t[keep] * dy[keep]
+        circles_out.append(circle_index[keep])
+        angles_out.append(np.arctan2(py - cy[keep], px - cx[keep]))
+        segments_out.append(segment_index[keep])
+        positions_out.append(t[keep])
+    return (
+        np.concatenate(circles_out), np.concatenate(angles_out),
+        np.concatenate(segments_out), np.concatenate(positions_out)
+    )
+
+
+def split_into_pieces(owner, position, count, period=None):
+    """
+    Splits each circle or segment at its breakpoints into consecutive pieces.
+
+    Args:
+        owner (np.ndarray): Circle or segment index of each breakpoint
+        position (np.ndarray): Angle or position along the segment of each breakpoint
+        count (int): Number of circles or segments
+        period (float, optional): 2*pi for circles, whose last piece wraps round to the first breakpoint;
+            None for segments, which run from 0 to 1
+
+    Returns:
+        tuple: (owner, start position, end position, breakpoint the piece starts at) of each piece, sorted by
+            owner and position; for segments, pieces starting at 0 have a breakpoint index past the given ones
+    """
+    if period is None:
+        # Segments always start at 0 and end at 1
+        owner = np.concatenate([owner, np.arange(count), np.arange(count)])
+        position = np.concatenate([position, np.zeros(count), np.ones(count)])
+    else:
+        # Circles without breakpoints are a single piece starting anywhere
+        unbroken = np.setdiff1d(np.arange(count), owner)
+        owner = np.concatenate([owner, unbroken])
+        position = np.concatenate([position, np.zeros(len(unbroken))])
+        # Breakpoints a rounding error apart, e.g. where three circles meet at one point, become one
+        position = np.round(position, 12)
+
+    # Positions span less than 8 (angles are from -pi to pi), so one key sorts by owner and then position
+    order = np.argsort(owner * 8.0 + position)
+    owner, position = owner[order], position[order]
+    if period is None:
+        same = owner[:-1] == owner[1:]
+        return owner[:-1][same], position[:-1][same], position[1:][same], order[:-1][same]
+
+    # Each piece runs to the next breakpoint on the same circle; the last one wraps round to the first
+    group_start = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])
+    group_first = np.repeat(group_start, np.diff(np.r_[group_start, len(owner)]))
+    next_index = np.arange(1, len(owner) + 1)
+    is_last = np.r_[owner[1:] != owner[:-1], True]
+    end = np.where(is_last, position[group_first] + period, position[np.minimum(next_index, len(owner) - 1)])
+    return owner, position, end, order
+
+
+REGIONS = {
+    # (inside an inclusion bubble, inside the boundary, inside an exclusion bubble) -> in region
+    'internal_inclusion': lambda inclusion, boundary, exclusion: inclusion & boundary,
+    'external_inclusion': lambda inclusion, boundary, exclusion: inclusion & ~boundary & ~exclusion,
+    'exclusion': lambda inclusion, boundary, exclusion: exclusion & boundary,
+    'net': lambda inclusion, boundary, exclusion: inclusion & boundary & ~exclusion,
+}
+
+
+def compute_exact_coverage_stats(boundary, inclusion_circles, exclusion_circles):
+    """
+    Computes the same statistics as compute_coverage_stats, treating bubbles as true circles rather than polygons.
+
+    The outline of each region (e.g. inside an inclusion bubble and the boundary but no exclusion
+    bubble) is made of circle arcs and boundary segments between crossing points. Each piece is
+    on the outline if the region is on one side of it and not the other, and the region's area
+    is the sum of the pieces' Green's theorem integrals, which are exact for both arcs and segments.
+
+    Args:
+        boundary: Shapely geometry object representing the boundary
+        inclusion_circles (np.ndarray): (n, 3) array of inclusion bubble x, y and radius in meters
+        exclusion_circles (np.ndarray): (m, 3) array of exclusion bubble x, y and radius in meters
+
+    Returns:
+        dict: Coverage statistics including internal_inclusion, external_inclusion, exclusion, and net coverage percentages
+    """
+    # Work relative to the boundary's corner so the integrals don't lose precision to large coordinates
+    minx, miny, _, _ = boundary.bounds
+    boundary = translate(boundary, -minx, -miny)
+    prepare(boundary)
+    # Duplicate circles would share every arc, so keep one of each
+    inclusion_circles = np.unique(np.asarray(inclusion_circles, dtype=float).reshape(-1, 3), axis=0)
+    exclusion_circles = np.unique(np.asarray(exclusion_circles, dtype=float).reshape(-1, 3), axis=0)
+    circles = np.concatenate([inclusion_circles, exclusion_circles])
+    is_inclusion = np.arange(len(circles)) < len(inclusion_circles)
+    circles[:, 0] -= minx
+    circles[:, 1] -= miny
+
+    starts, ends = boundary_segments(boundary)
+    totals = dict.fromkeys(REGIONS, 0.0)
+    if len(circles) == 0:
+        return totals
+
+    # Every later test only needs the circles and segments whose bounding boxes meet
+    boxes = circle_boxes(circles)
+    first, second = STRtree(boxes).query(boxes)
+    segment_boxes = shapely.box(
+        np.minimum(starts[:, 0], ends[:, 0]), np.minimum(starts[:, 1], ends[:, 1]),
+        np.maximum(starts[:, 0], ends[:, 0]), np.maximum(starts[:, 1], ends[:, 1])
+    )
+    near_circle, near_segment = STRtree(segment_boxes).query(boxes)
+
+    crossings = circle_circle_crossings(circles, first, second)
+    segment_circle, segment_angle, segment_owner, segment_position = circle_segment_breakpoints(
+        circles, starts, ends, near_circle, near_segment
+    )
+    arc_circle, arc_start, arc_end, arc_source = split_into_pieces(
+        np.concatenate([crossings[0], crossings[0], segment_circle]),
+        np.concatenate([crossings[2], crossings[3], segment_angle]),
+        len(circles), 2 * math.pi
+    )
+
+    other_inclusion, other_exclusion = covered_arcs(
+        arc_circle, arc_source, crossings, [is_inclusion, ~is_inclusion], len(circles)
+    )
+    own_inclusion = is_inclusion[arc_circle]
+    # Arcs inside another bubble of the same kind have the same regions on both sides, so add nothing
+    outline = np.where(own_inclusion, ~other_inclusion, ~other_exclusion)
+    arc_circle, arc_start, arc_end, other_inclusion, other_exclusion, own_inclusion = (
+        values[outline] for values in (arc_circle, arc_start, arc_end, other_inclusion, other_exclusion, own_inclusion)
+    )
+
+    # Circle arcs, anticlockwise with the circle's inside on their left
+    cx, cy, r = circles[arc_circle].T
+    arc_integral = 0.5 * (
+        r * r * (arc_end - arc_start)
+        + r * (cx * (np.sin(arc_end) - np.sin(arc_start)) - cy * (np.cos(arc_end) - np.cos(arc_start)))
+    )
+    # A circle that never crosses the outline is wholly inside or outside it, apart from any points where
+    # it touches the outline, which count as outside; so it is inside if any of a few of its points is
+    crosses = np.zeros(len(circles), dtype=bool)
+    crosses[segment_circle] = True
+    circle_in_boundary = contains_xy(
+        boundary,
+        circles[:, 0, None] + circles[:, 2, None] * np.cos(TEST_ANGLES),
+        circles[:, 1, None] + circles[:, 2, None] * np.sin(TEST_ANGLES)
+    ).any(axis=1)
+    tested = crosses[arc_circle]
+    in_boundary = circle_in_boundary[arc_circle] & ~tested
+    # An arc between crossings is wholly inside or outside too, but may touch the outline at its middle
+    for fraction in TEST_FRACTIONS:
+        angle = arc_start[tested] + fraction * (arc_end[tested] - arc_start[tested])
+        in_boundary[tested] |= contains_xy(
+            boundary, cx[tested] + r[tested] * np.cos(angle), cy[tested] + r[tested] * np.sin(angle)
+        )
+
+    left = (other_inclusion | own_inclusion, in_boundary, other_exclusion | ~own_inclusion)
+    right = (other_inclusion, in_boundary, other_exclusion)
+    for name, region in REGIONS.items():
+        totals[name] += np.sum(arc_integral * (region(*left).astype(int) - region(*right).astype(int)))
+
+    # Boundary segments, with the boundary's inside on their left
+    owner, t0, t1, _ = split_into_pieces(segment_owner, segment_position, len(starts))
+    direction = ends[owner] - starts[owner]
+    ax, ay = (starts[owner] + t0[:, None] * direction).T
+    bx, by = (starts[owner] + t1[:, None] * direction).T
+    segment_integral = 0.5 * (ax * by - bx * ay)
+    mx, my = (ax + bx) / 2, (ay + by) / 2
+    piece, candidate = expand_candidates(owner, near_segment, near_circle)
+    in_inclusion = containing(circles, mx, my, piece, candidate, is_inclusion)
+    in_exclusion = containing(circles, mx, my, piece, candidate, ~is_inclusion)
+    for name, region in REGIONS.items():
+        on_left = region(in_inclusion, np.ones(len(mx), dtype=bool), in_exclusion)
+        on_right = region(in_inclusion, np.zeros(len(mx), dtype=bool), in_exclusion)
+        totals[name] += np.sum(segment_integral * (on_left.astype(int) - on_right.astype(int)))
+
+    area = boundary.area
+    return {name: 100 * total / area for name, total in totals.items()}
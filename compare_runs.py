@@ -0,0 +1,263 @@
+"""Compares two output directories, e.g. a baseline run and a run with a faster mode, and fails on regressions."""
+
+import argparse
+import csv
+import os
+import re
+import sys
+from collections import defaultdict
+
+import numpy as np
+
+# Coverage columns of statistics.csv and whether a higher value is better
+COVERAGE_COLUMNS = {
+    'internal_inclusion_coverage': True,
+    'external_inclusion_coverage': False,
+    'exclusion_coverage': False,
+    'net_coverage': True,
+}
+BUBBLE_PATTERN = re.compile(r'\((?P<lat>[^,]+), (?P<long>[^)]+)\) \+(?P<radius>\d+)(?P<unit>km|m)')
+# Bubbles are written with their radius in meters; runs from before then wrote it in km
+UNIT_METERS = {'m': 1, 'km': 1000}
+# About 0.1m of latitude; bubbles closer than this in both coordinates count as unchanged
+DEFAULT_POSITION_TOLERANCE = 1e-6
+
+
+def parse_bubble(bubble):
+    """
+    Parses a bubble as written to bubbles.csv.
+
+    Args:
+        bubble (str): e.g. '(51.5, -0.1) +2000m'
+
+    Returns:
+        tuple: (latitude, longitude, radius in meters), or None if the string isn't a bubble
+    """
+    match = BUBBLE_PATTERN.fullmatch(bubble)
+    if match is None:
+        return None
+    return float(match['lat']), float(match['long']), int(match['radius']) * UNIT_METERS[match['unit']]
+
+
+def read_statistics(output_directory):
+    """
+    Reads the per-boundary rows of a run's statistics.csv, skipping the summary rows.
+
+    Args:
+        output_directory (str): Run output directory, e.g. output/constituencies
+
+    Returns:
+        dict: Boundary name -> row dict
+    """
+    statistics = {}
+    with open(os.path.join(output_directory, 'statistics.csv')) as f:
+        for row in csv.DictReader(f):
+            if row['name'] and row.get('net_coverage'):
+                statistics[row['name']] = row
+    return statistics
+
+
+def read_bubbles(output_directory):
+    """
+    Reads a run's bubbles.csv.
+
+    Args:
+        output_directory (str): Run output directory, e.g. output/constituencies
+
+    Returns:
+        dict: Boundary name -> {bubble type -> sorted list of (latitude, longitude, radius)}
+    """
+    bubbles = defaultdict(lambda: defaultdict(list))
+    with open(os.path.join(output_directory, 'bubbles.csv')) as f:
+        for row in csv.DictReader(f):
+            bubble = parse_bubble(row['bubble'])
+            if bubble is not None:
+                bubbles[row['name']][row['type']].append(bubble)
+    for boundary_bubbles in bubbles.values():
+        for bubble_list in boundary_bubbles.values():
+            bubble_list.sort()
+    return bubbles
+
+
+def bubbles_match(baseline_list, candidate_list, position_tolerance):
+    """
+    Checks whether two lists of bubbles are the same, allowing for floating-point jitter in their positions.
+
+    Args:
+        baseline_list (list): (latitude, longitude, radius) of each baseline bubble
+        candidate_list (list): (latitude, longitude, radius) of each candidate bubble
+        position_tolerance (float): Largest difference in latitude or longitude, in degrees, of matching bubbles
+
+    Returns:
+        bool: True if every bubble has a match of the same radius within the tolerance
+    """
+    if len(baseline_list) != len(candidate_list):
+        return False
+    if not baseline_list:
+        return True
+    baseline = np.array(baseline_list, dtype=float)
+    candidate = np.array(candidate_list, dtype=float)
+    close = (
+        (np.abs(baseline[:, None, 0] - candidate[None, :, 0]) <= position_tolerance)
+        & (np.abs(baseline[:, None, 1] - candidate[None, :, 1]) <= position_tolerance)
+        & (baseline[:, None, 2] == candidate[None, :, 2])
+    )
+    # Bubbles are rarely within the tolerance of more than one other, so a greedy matching suffices
+    unmatched = np.ones(len(candidate), dtype=bool)
+    for row in close:
+        matches = np.flatnonzero(row & unmatched)
+        if len(matches) == 0:
+            return False
+        unmatched[matches[0]] = False
+    return True
+
+
+def parse_runtime(row):
+    value = row.get('runtime_seconds')
+    return float(value) if value else None
+
+
+def compare_boundary(name, baseline_row, candidate_row, baseline_bubbles, candidate_bubbles, coverage_tolerance, bubble_tolerance, position_tolerance=DEFAULT_POSITION_TOLERANCE):
+    """
+    Compares one boundary between two runs.
+
+    Args:
+        name (str): Boundary name
+        baseline_row (dict): Baseline statistics row
+        candidate_row (dict): Candidate statistics row
+        baseline_bubbles (dict): Baseline bubbles by type
+        candidate_bubbles (dict): Candidate bubbles by type
+        coverage_tolerance (float): Allowed worsening of any coverage column, in percentage points
+        bubble_tolerance (int): Allowed increase in the number of inclusion bubbles
+        position_tolerance (float): Largest difference in latitude or longitude, in degrees, of unchanged bubbles
+
+    Returns:
+        tuple: (list of regression descriptions, list of other difference descriptions)
+    """
+    regressions = []
+    differences = []
+
+    for column, higher_is_better in COVERAGE_COLUMNS.items():
+        baseline_value = float(baseline_row[column])
+        candidate_value = float(candidate_row[column])
+        change = candidate_value - baseline_value
+        worsening = -change if higher_is_better else change
+        description = f'{name}: {column} {baseline_value:.4f} -> {candidate_value:.4f} ({change:+.4f})'
+        if worsening > coverage_tolerance:
+            regressions.append(description)
+        elif abs(change) > coverage_tolerance:
+            differences.append(description)
+
+    if baseline_row.get('status', 'finished') == 'finished' and candidate_row.get('status', 'finished') == 'cut_off':
+        regressions.append(f'{name}: bubble placement was cut off by the time budget')
+
+    for bubble_type in ('inclusion', 'exclusion'):
+        baseline_list = baseline_bubbles.get(bubble_type, [])
+        candidate_list = candidate_bubbles.get(bubble_type, [])
+        if bubbles_match(baseline_list, candidate_list, position_tolerance):
+            continue
+        description = f'{name}: {bubble_type} bubbles changed ({len(baseline_list)} -> {len(candidate_list)})'
+        if bubble_type == 'inclusion' and len(candidate_list) - len(baseline_list) > bubble_tolerance:
+            regressions.append(description)
+        else:
+            differences.append(description)
+
+    return regressions, differences
+
+
+def format_runtime(runtime):
+    return '-' if runtime is None else f'{runtime:.3f}'
+
+
+def compare_runs(baseline_directory, candidate_directory, coverage_tolerance=0.01, bubble_tolerance=0, show_runtimes=True, position_tolerance=DEFAULT_POSITION_TOLERANCE):
+    """
+    Compares every boundary of two runs and prints the differences and runtimes side by side.
+
+    Args:
+        baseline_directory (str): Output directory of the baseline run
+        candidate_directory (str): Output directory of the candidate run
+        coverage_tolerance (float): Allowed worsening of any coverage column, in percentage points
+        bubble_tolerance (int): Allowed increase in the number of inclusion bubbles per boundary
+        show_runtimes (bool): Print each boundary's runtime in both runs
+        position_tolerance (float): Largest difference in latitude or longitude, in degrees, of unchanged bubbles
+
+    Returns:
+        list: Descriptions of all regressions found
+    """
+    baseline_statistics = read_statistics(baseline_directory)
+    candidate_statistics = read_statistics(candidate_directory)
+    baseline_bubbles = read_bubbles(baseline_directory)
+    candidate_bubbles = read_bubbles(candidate_directory)
+
+    regressions = [f'{name}: missing from candidate run' for name in baseline_statistics if name not in candidate_statistics]
+    differences = [f'{name}: only in candidate run' for name in candidate_statistics if name not in baseline_statistics]
+
+    if show_runtimes:
+        print(f'{"boundary":<50} {"baseline s":>12} {"candidate s":>12} {"speedup":>8}')
+
+    baseline_total = candidate_total = 0.0
+    for name, baseline_row in baseline_statistics.items():
+        if name not in candidate_statistics:
+            continue
+        candidate_row = candidate_statistics[name]
+        boundary_regressions, boundary_differences = compare_boundary(
+            name, baseline_row, candidate_row, baseline_bubbles[name], candidate_bubbles[name],
+            coverage_tolerance, bubble_tolerance, position_tolerance
+        )
+        regressions += boundary_regressions
+        differences += boundary_differences
+
+        baseline_runtime = parse_runtime(baseline_row)
+        candidate_runtime = parse_runtime(candidate_row)
+        speedup = '-'
+        if baseline_runtime is not None and candidate_runtime is not None:
+            baseline_total += baseline_runtime
+            candidate_total += candidate_runtime
+            if candidate_runtime > 0:
+                speedup = f'{baseline_runtime / candidate_runtime:.2f}x'
+        if show_runtimes:
+            print(f'{name[:50]:<50} {format_runtime(baseline_runtime):>12} {format_runtime(candidate_runtime):>12} {speedup:>8}')
+
+    if show_runtimes and candidate_total > 0:
+        print(f'{"total":<50} {baseline_total:>12.3f} {candidate_total:>12.3f} {baseline_total / candidate_total:>7.2f}x')
+
+    print(f'\n{len(differences)} differences within tolerance or improvements:')
+    for description in differences:
+        print(f'  {description}')
+    print(f'\n{len(regressions)} regressions:')
+    for description in regressions:
+        print(f'  {description}')
+
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the bubbles, statistics and runtimes of two runs')
+    parser.add_argument('baseline', help='Output directory of the baseline run, e.g. output/constituencies')
+    parser.add_argument('candidate', help='Output directory of the run to check')
+    parser.add_argument(
+        '--coverage-tolerance',
+        type=float,
+        default=0.01,
+        help='Allowed worsening of any coverage column, in percentage points (default: 0.01)',
+    )
+    parser.add_argument(
+        '--bubble-tolerance',
+        type=int,
+        default=0,
+        help='Allowed increase in inclusion bubbles per boundary (default: 0)',
+    )
+    parser.add_argument(
+        '--position-tolerance',
+        type=float,
+        default=DEFAULT_POSITION_TOLERANCE,
+        help=f'Largest difference in latitude or longitude, in degrees, of bubbles counted as unchanged (default: {DEFAULT_POSITION_TOLERANCE})',
+    )
+    parser.add_argument('--no-runtimes', action='store_true', help='Do not print the per-boundary runtime table')
+    args = parser.parse_args()
+
+    found_regressions = compare_runs(
+        args.baseline, args.candidate, args.coverage_tolerance, args.bubble_tolerance, not args.no_runtimes,
+        args.position_tolerance
+    )
+    sys.exit(1 if found_regressions else 0)
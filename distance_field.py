@@ -0,0 +1,138 @@
+"""Raster distance field of a boundary, used to find where bubbles of any radius can be centred."""
+
+import math
+
+import numpy as np
+from contourpy import contour_generator, FillType  # installed with matplotlib
+from shapely import contains_xy, prepare
+from shapely.geometry import Polygon, MultiPolygon
+
+DEFAULT_MAX_CELLS = 512
+
+
+def squared_distance_transform(inside):
+    """
+    Computes the exact squared Euclidean distance, in cells, from every cell to the nearest outside cell.
+
+    Takes time linear in the number of cells: the distance along each column is combined across each
+    row using the lower envelope of the parabolas (j - k)^2 + column_distance[k]^2 (Felzenszwalb and
+    Huttenlocher), built for every row at once.
+
+    Args:
+        inside (np.ndarray): 2D boolean array, True for cells inside the shape
+
+    Returns:
+        np.ndarray: 2D float array of squared distances (zero for outside cells)
+    """
+    rows, columns = inside.shape
+    infinity = float(rows + columns) ** 2
+
+    # Distance along each column to the nearest outside cell, sweeping down then up
+    column_distance = np.where(inside, infinity, 0.0)
+    for row in range(1, rows):
+        column_distance[row] = np.minimum(column_distance[row], column_distance[row - 1] + 1)
+    for row in range(rows - 2, -1, -1):
+        column_distance[row] = np.minimum(column_distance[row], column_distance[row + 1] + 1)
+    heights = column_distance ** 2
+
+    # Lower envelope of each row's parabolas: the centre of each, and where along the row it becomes the lowest
+    every_row = np.arange(rows)
+    centres = np.zeros((rows, columns), dtype=np.int64)
+    starts = np.full((rows, columns + 1), np.inf)
+    starts[:, 0] = -np.inf
+    top = np.zeros(rows, dtype=np.int64)
+    for column in range(1, columns):
+        index = top.copy()
+        # Drop parabolas that the new one lies below from where they start
+        while True:
+            previous = centres[every_row, index]
+            intersection = (
+                (heights[:, column] + column * column) - (heights[every_row, previous] + previous * previous)
+            ) / (2 * (column - previous))
+            hidden = intersection <= starts[every_row, index]
+            if not hidden.any():
+                break
+            index -= hidden
+        index += 1
+        centres[every_row, index] = column
+        starts[every_row, index] = intersection
+        starts[every_row, index + 1] = np.inf
+        top = index
+
+    squared = np.empty_like(heights)
+    index = np.zeros(rows, dtype=np.int64)
+    for column in range(columns):
+        while True:
+            beyond = starts[every_row, index + 1] < column
+            if not beyond.any():
+                break
+            index += beyond
+        nearest = centres[every_row, index]
+        squared[:, column] = (column - nearest) ** 2 + heights[every_row, nearest]
+    return squared
+
+
+class DistanceField:
+    """
+    Distance from every point inside a boundary to the boundary's outline, sampled on a grid.
+
+    Computed once per boundary, it answers "where can a bubble of radius r be centred?" for
+    every r by thresholding, instead of a negative buffer of the whole boundary per radius.
+    Sampled values are within `error` meters of the true distance; islands are thresholded
+    half a cell conservatively so their outlines stay inside the exact region.
+    """
+
+    def __init__(self, boundary, cell_size=None, max_cells=DEFAULT_MAX_CELLS):
+        """
+        Args:
+            boundary: A shapely geometry object representing the boundary
+            cell_size (float, optional): Grid spacing in meters; by default the boundary's longest side
+                is split into `max_cells` cells
+            max_cells (int): Number of cells along the longest side when `cell_size` is not given
+        """
+        minx, miny, maxx, maxy = boundary.bounds
+        self.cell_size = cell_size or max(maxx - minx, maxy - miny, 1) / max_cells
+        self.error = self.cell_size * math.sqrt(2)
+
+        # One spare cell on every side so the outline is always surrounded by outside cells
+        self.x = np.arange(minx - self.cell_size / 2, maxx + self.cell_size, self.cell_size)
+        self.y = np.arange(miny - self.cell_size / 2, maxy + self.cell_size, self.cell_size)
+        grid_x, grid_y = np.meshgrid(self.x, self.y)
+
+        prepare(boundary)
+        inside = contains_xy(boundary, grid_x, grid_y)
+        # Cell centres are measured to the nearest outside cell centre; the outline lies about half a cell before it
+        self.distance = np.maximum(np.sqrt(squared_distance_transform(inside)) - 0.5, 0) * self.cell_size
+        self._contours = contour_generator(self.x, self.y, self.distance, fill_type=FillType.OuterOffset)
+
+    def max_distance(self):
+        """
+        Returns an upper bound on the distance of any interior point from the outline.
+
+        Returns:
+            float: Upper bound in meters
+        """
+        return float(self.distance.max()) + self.error
+
+    def island(self, distance):
+        """
+        Returns the region of points at least `distance` from the outline.
+
+        Args:
+            distance (float): Minimum distance from the outline in meters
+
+        Returns:
+            MultiPolygon: The region, empty if no point is that far from the outline
+        """
+        level = distance + self.cell_size / 2
+        if level >= self.distance.max():
+            return MultiPolygon()
+
+        polygons = []
+        point_arrays, offset_arrays = self._contours.filled(level, self.distance.max() + 1)
+        for points, offsets in zip(point_arrays, offset_arrays):
+            rings = [points[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+            polygon = Polygon(rings[0], rings[1:])
+            if not polygon.is_empty and polygon.area > 0:
+                polygons.append(polygon)
+        return MultiPolygon(polygons)
@@ -0,0 +1,143 @@
+"""Ward-to-constituency nesting, so a run over both levels shares work between them."""
+
+import numpy as np
+import shapely
+from shapely import STRtree, box, contains_xy, prepare
+from shapely.geometry import Point
+
+from bubble_generation import BUBBLE_LIMIT, calculate_bubbles_with_exclusions, generate_exclusion_bubbles
+from catalogue import load_boundaries
+from refinement import CoverageSamples, greedy_coverage_order
+
+PADDING = 500
+RADIUS_MARGIN = 30
+
+
+class WardNesting:
+    """
+    Finds the wards nested within each constituency, using the ward catalogue's bounding boxes
+    so only nearby ward geometries are read.
+
+    A ward belongs to the constituency containing its representative point, and to no other.
+    """
+
+    def __init__(self, ward_entries):
+        """
+        Args:
+            ward_entries (list): Ward catalogue entries
+        """
+        self.entries = ward_entries
+        self.tree = STRtree([box(*entry['bounds']) for entry in ward_entries])
+        self.assigned = set()
+
+    def nested_wards(self, constituency):
+        """
+        Loads the wards within a constituency that haven't already been assigned to another.
+
+        Args:
+            constituency: Shapely geometry of the constituency
+
+        Returns:
+            list: (ward name, ward geometry) tuples
+        """
+        prepare(constituency)
+        candidates = [
+            self.entries[i] for i in sorted(self.tree.query(constituency, predicate='intersects').tolist())
+            if (self.entries[i]['source'], self.entries[i]['fid']) not in self.assigned
+        ]
+        wards = []
+        for entry, ward_item in zip(candidates, load_boundaries(candidates)):
+            if constituency.contains(ward_item[1].representative_point()):
+                self.assigned.add((entry['source'], entry['fid']))
+                wards.append(ward_item)
+        return wards
+
+    def unassigned(self):
+        """
+        Returns the ward entries not nested within any constituency processed so far.
+
+        Returns:
+            list: Ward catalogue entries
+        """
+        return [entry for entry in self.entries if (entry['source'], entry['fid']) not in self.assigned]
+
+
+def seed_candidates(padded_boundary, seeds):
+    """
+    Grows a bubble around each seed centre to the largest whole number of km within the padded boundary.
+
+    Args:
+        padded_boundary: Shapely geometry bubbles must stay within
+        seeds (list): (x, y) candidate centres, e.g. the centres of the bubbles placed in nested wards
+
+    Returns:
+        list: Distinct (x, y, radius in meters) candidate circles
+    """
+    if not seeds:
+        return []
+    x, y = np.array(seeds, dtype=float).T
+    points = shapely.points(x, y)
+    distances = shapely.distance(shapely.boundary(padded_boundary), points)
+    radii = ((distances - RADIUS_MARGIN) // 1000) * 1000
+    keep = contains_xy(padded_boundary, x, y) & (radii >= 1000)
+    keep[keep] = shapely.contains(padded_boundary, shapely.buffer(points[keep], radii[keep], quad_segs=16))
+    return sorted(set(zip(x[keep].tolist(), y[keep].tolist(), radii[keep].tolist())))
+
+
+def select_seeded_bubbles(boundary, padded_boundary, seeds, exclusion_bubbles, deadline=None):
+    """
+    Greedily picks the candidate circle adding the most net coverage until none adds any or the bubble limit is reached.
+
+    Args:
+        boundary: Shapely geometry coverage is measured against
+        padded_boundary: Shapely geometry bubbles must stay within
+        seeds (list): (x, y) candidate centres
+        exclusion_bubbles (list): Exclusion bubble geometries; area inside them doesn't count
+        deadline (Deadline, optional): Stop picking once this passes, keeping those picked so far
+
+    Returns:
+        list: (x, y, radius in meters) of each picked circle
+    """
+    candidates = seed_candidates(padded_boundary, seeds)
+    samples = CoverageSamples(boundary, exclusion_bubbles)
+    if not candidates or len(samples.x) == 0:
+        return []
+
+    order, _ = greedy_coverage_order(samples, candidates, BUBBLE_LIMIT, deadline)
+    return [candidates[i] for i in order]
+
+
+def calculate_seeded_bubbles(boundary, seeds, deadline=None, exclusions=None, use_distance_field=False):
+    """
+    Equivalent of calculate_bubbles_with_exclusions that picks inclusion bubbles from seed centres
+    instead of buffering the boundary at every radius.
+
+    Falls back to calculate_bubbles_with_exclusions if no seed gives a bubble within the padded boundary.
+
+    Args:
+        boundary: A shapely geometry object representing the boundary
+        seeds (list): (x, y) candidate centres, e.g. the centres of the bubbles placed in nested wards
+        deadline (Deadline, optional): Time limit for picking inclusion bubbles
+        exclusions (tuple, optional): Precomputed (exclusion bubbles, exclusion data)
+        use_distance_field (bool): Use a distance field if falling back to calculate_bubbles_with_exclusions
+
+    Returns:
+        tuple: (list of inclusion bubble geometries, list of inclusion bubble data [x, y, radius],
+                list of exclusion bubble geometries, list of exclusion bubble data [x, y, radius])
+    """
+    if exclusions is None:
+        exclusions = generate_exclusion_bubbles(boundary)
+    exclusion_bubbles, exclusion_data = exclusions
+
+    padded_boundary = boundary.buffer(PADDING)
+    prepare(padded_boundary)
+    circles = select_seeded_bubbles(boundary, padded_boundary, seeds, exclusion_bubbles, deadline)
+    if not circles:
+        return calculate_bubbles_with_exclusions(
+            boundary, use_distance_field=use_distance_field, deadline=deadline, exclusions=exclusions
+        )
+
+    print(f"   Picked {len(circles)} inclusion bubbles from {len(seeds)} seeds")
+    inclusion_bubbles = [Point(x, y).buffer(radius) for x, y, radius in circles]
+    inclusion_data = [[x, y, int(radius)] for x, y, radius in circles]
+    return inclusion_bubbles, inclusion_data, exclusion_bubbles, exclusion_data
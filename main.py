@@ -1,14 +1,28 @@
 import argparse
+import collections
 import csv
+import itertools
 import os
+import shutil
+import time
 import pyproj
+from shapely.geometry import Point
 
-from boundaries import get_boundaries, filter_boundaries, setup_output_directories, setup_output_files, get_output_directory
-from bubble_generation import calculate_bubbles_with_exclusions
-from analysis import compute_coverage_stats, create_boundary_visualization, write_summary_statistics
+from boundaries import get_boundary_sources, setup_output_directories, setup_output_files, get_output_directory
+from catalogue import get_catalogue, select_entries, load_boundaries
+from bubble_generation import calculate_bubbles_with_exclusions, generate_exclusion_bubbles, Deadline
+from batch import calculate_bubbles_batch, compute_coverage_stats_batch
+from analysis import compute_coverage_stats, create_boundary_visualization, write_summary_statistics, SummaryStatistics
+from circle_union import bubble_circles, compute_exact_coverage_stats
+from simplification import simplify_boundary, report_simplification
+from refinement import refine_bubbles
+from hierarchy import WardNesting, calculate_seeded_bubbles
+from allocation import setup_curves_file, coverage_curve, allocate
+from revision import get_previous_run, changed_edges, revise_bubbles
 from utils import sanitize_filename
+import work_queue
 
-def process_boundary(boundary_item, output_type, transformer, output_writer, statistics_writer):
+def process_boundary(boundary_item, output_type, transformer, output_writer, statistics_writer, simplify_tolerance=0, use_distance_field=False, time_budget=None, refine=False, seeds=None, curves_writer=None, exact_coverage=False):
     """
     Processes a single boundary: generates bubbles, creates visualizations, and writes statistics.
 
@@ -18,17 +32,212 @@ def process_boundary(boundary_item, output_type, transformer, output_writer, sta
         transformer: Coordinate transformer object
         output_writer: CSV writer for bubble data
         statistics_writer: CSV writer for statistics
+        simplify_tolerance (float): If non-zero, inclusion bubbles are placed in a copy of the boundary
+            simplified with this tolerance in meters; exclusion bubbles and statistics still use the original
+        use_distance_field (bool): Derive inclusion bubble placement from a per-boundary distance field
+        time_budget (float, optional): Seconds allowed for this boundary, from the start of processing it.
+            Exclusion bubbles and coverage statistics are always computed in full; inclusion bubble
+            placement stops when the time runs out, keeping the bubbles placed so far
+        refine (bool): Improve the inclusion bubbles with a local-search refinement pass
+        seeds (list, optional): (x, y) candidate bubble centres, e.g. from the wards nested within this
+            constituency; inclusion bubbles are picked from them instead of placed from scratch
+        curves_writer (optional): CSV writer for this boundary's coverage curve, used to allocate a
+            campaign-wide bubble budget
+        exact_coverage (bool): Measure coverage of the bubbles as true circles instead of polygons
 
     Returns:
-        dict: Coverage statistics for this boundary
+        tuple: (coverage statistics dict, list of inclusion bubble data [x, y, radius])
     """
     boundary_name = boundary_item[0]
     boundary = boundary_item[1]
+    # Everything done for this boundary counts against its time budget and runtime, not only bubble placement
+    start_time = time.perf_counter()
+    deadline = Deadline(time_budget)
 
-    inclusion_bubbles, inclusion_data, exclusion_bubbles, exclusion_data = (
-        calculate_bubbles_with_exclusions(boundary)
+    placement_boundary = boundary
+    exclusions = None
+    if simplify_tolerance:
+        placement_boundary = simplify_boundary(boundary, simplify_tolerance)
+        # The simplified outline can lie up to the tolerance outside the original, so exclusion bubbles
+        # placed around it would cut into the original boundary
+        exclusions = generate_exclusion_bubbles(boundary)
+    if seeds is not None:
+        inclusion_bubbles, inclusion_data, exclusion_bubbles, exclusion_data = (
+            calculate_seeded_bubbles(
+                placement_boundary, seeds, deadline=deadline, exclusions=exclusions, use_distance_field=use_distance_field
+            )
+        )
+    else:
+        inclusion_bubbles, inclusion_data, exclusion_bubbles, exclusion_data = (
+            calculate_bubbles_with_exclusions(
+                placement_boundary,
+                containment_margin=simplify_tolerance,
+                use_distance_field=use_distance_field,
+                deadline=deadline,
+                exclusions=exclusions
+            )
+        )
+
+    if refine:
+        inclusion_bubbles, inclusion_data = refine_bubbles(
+            boundary,
+            placement_boundary.buffer(500 - simplify_tolerance),
+            inclusion_bubbles,
+            inclusion_data,
+            exclusion_bubbles,
+            deadline=deadline
+        )
+
+    # Calculate coverage statistics
+    coverage_stats = get_coverage_stats(boundary, inclusion_bubbles, exclusion_bubbles, exact_coverage)
+    if simplify_tolerance:
+        report_simplification(boundary, placement_boundary, coverage_stats)
+    runtime = time.perf_counter() - start_time
+
+    write_boundary_results(
+        boundary_name,
+        boundary,
+        (inclusion_bubbles, inclusion_data, exclusion_bubbles, exclusion_data),
+        coverage_stats,
+        output_type,
+        transformer,
+        output_writer,
+        statistics_writer,
+        'cut_off' if deadline.reached else 'finished',
+        runtime
     )
 
+    if curves_writer is not None:
+        write_coverage_curve(
+            boundary_name, boundary, (inclusion_bubbles, inclusion_data, exclusion_bubbles, exclusion_data),
+            coverage_stats, transformer, curves_writer
+        )
+
+    return coverage_stats, inclusion_data
+
+def get_coverage_stats(boundary, inclusion_bubbles, exclusion_bubbles, exact_coverage=False):
+    """
+    Computes a boundary's coverage statistics from its bubble polygons, or from the circles they were made from.
+
+    Args:
+        boundary: Shapely geometry object representing the boundary
+        inclusion_bubbles (list): List of inclusion bubble geometries
+        exclusion_bubbles (list): List of exclusion bubble geometries
+        exact_coverage (bool): Measure the bubbles as true circles, without the polygons' chord error
+
+    Returns:
+        dict: Coverage statistics including internal_inclusion, external_inclusion, exclusion, and net coverage percentages
+    """
+    if exact_coverage:
+        return compute_exact_coverage_stats(boundary, bubble_circles(inclusion_bubbles), bubble_circles(exclusion_bubbles))
+    return compute_coverage_stats(boundary, inclusion_bubbles, exclusion_bubbles)
+
+def write_coverage_curve(boundary_name, boundary, bubbles, coverage_stats, transformer, curves_writer):
+    """
+    Writes a boundary's inclusion bubbles in order of the net coverage they add, with the coverage after each.
+
+    Args:
+        boundary_name (str): Name of the boundary
+        boundary: Shapely geometry object representing the boundary
+        bubbles (tuple): (inclusion bubbles, inclusion data, exclusion bubbles, exclusion data)
+        coverage_stats (dict): Coverage statistics for the boundary
+        transformer: Coordinate transformer object
+        curves_writer: CSV writer for coverage curves
+    """
+    inclusion_bubbles, inclusion_data, exclusion_bubbles, exclusion_data = bubbles
+    order, curve = coverage_curve(boundary, inclusion_bubbles, exclusion_bubbles, coverage_stats["net"])
+    for rank, (index, net_coverage) in enumerate(zip(order, curve), start=1):
+        curves_writer.writerow([boundary_name, 'inclusion', rank, format_bubble(transformer, *inclusion_data[index]), net_coverage])
+    for data in exclusion_data:
+        curves_writer.writerow([boundary_name, 'exclusion', '', format_bubble(transformer, *data), ''])
+
+def format_bubble(transformer, x, y, radius):
+    """
+    Formats a bubble as latitude/longitude and radius, as written to bubbles.csv.
+
+    Args:
+        transformer: Coordinate transformer object
+        x (float): Bubble centre easting
+        y (float): Bubble centre northing
+        radius (int): Bubble radius in meters
+
+    Returns:
+        str: e.g. '(51.5, -0.1) +2000m'
+    """
+    lat, long = transformer.transform(x, y)
+    return f'({lat}, {long}) +{radius}m'
+
+def process_boundary_batch(boundary_items, output_type, transformer, output_writer, statistics_writer, exact_coverage=False):
+    """
+    Processes a block of boundaries together with the vectorized batch engine.
+
+    Gives the same results as calling process_boundary on each boundary in turn.
+
+    Args:
+        boundary_items (list): List of (boundary name, boundary geometry) tuples
+        output_type (str): Type of boundaries being processed
+        transformer: Coordinate transformer object
+        output_writer: CSV writer for bubble data
+        statistics_writer: CSV writer for statistics
+        exact_coverage (bool): Measure coverage of the bubbles as true circles instead of polygons
+
+    Returns:
+        list: Coverage statistics for each boundary
+    """
+    boundaries = [boundary for _, boundary in boundary_items]
+    print(f'Processing batch of {len(boundaries)} boundaries')
+
+    start_time = time.perf_counter()
+    bubbles = calculate_bubbles_batch(boundaries)
+    if exact_coverage:
+        statistics = [
+            get_coverage_stats(boundary, inclusion_bubbles, exclusion_bubbles, exact_coverage=True)
+            for boundary, (inclusion_bubbles, _, exclusion_bubbles, _) in zip(boundaries, bubbles)
+        ]
+    else:
+        statistics = compute_coverage_stats_batch(
+            boundaries,
+            [inclusion_bubbles for inclusion_bubbles, _, _, _ in bubbles],
+            [exclusion_bubbles for _, _, exclusion_bubbles, _ in bubbles]
+        )
+    # Boundaries in a batch are processed together, so each is given an equal share of the time
+    runtime = (time.perf_counter() - start_time) / len(boundaries)
+
+    for (boundary_name, boundary), boundary_bubbles, coverage_stats in zip(boundary_items, bubbles, statistics):
+        write_boundary_results(
+            boundary_name,
+            boundary,
+            boundary_bubbles,
+            coverage_stats,
+            output_type,
+            transformer,
+            output_writer,
+            statistics_writer,
+            'finished',
+            runtime
+        )
+
+    return statistics
+
+def write_boundary_results(boundary_name, boundary, bubbles, coverage_stats, output_type, transformer, output_writer, statistics_writer, status='finished', runtime=None):
+    """
+    Writes a boundary's bubbles and statistics to the CSV outputs and creates its visualization.
+
+    Args:
+        boundary_name (str): Name of the boundary
+        boundary: Shapely geometry object representing the boundary
+        bubbles (tuple): (inclusion bubbles, inclusion data, exclusion bubbles, exclusion data)
+        coverage_stats (dict): Coverage statistics for the boundary
+        output_type (str): Type of boundaries being processed
+        transformer: Coordinate transformer object
+        output_writer: CSV writer for bubble data
+        statistics_writer: CSV writer for statistics
+        status (str): 'finished', or 'cut_off' if bubble placement ran out of time
+        runtime (float, optional): Seconds spent on the boundary, from before any simplification to its
+            statistics
+    """
+    inclusion_bubbles, inclusion_data, exclusion_bubbles, exclusion_data = bubbles
+
     # Write bubble data to CSV
     csv_file = os.path.join(get_output_directory(output_type, 'CSVs'), f'{sanitize_filename(boundary_name)}.csv')
     with open(csv_file, 'w') as csv_output:
@@ -37,28 +246,25 @@ def process_boundary(boundary_item, output_type, transformer, output_writer, sta
 
         # Write inclusion bubbles
         for (x, y, radius) in inclusion_data:
-            lat, long = transformer.transform(x, y)
-            bubble_str = f'({lat}, {long}) +{radius}km'
+            bubble_str = format_bubble(transformer, x, y, radius)
             bubbles_writer.writerow(['inclusion', bubble_str, radius])
             output_writer.writerow([bubble_str, boundary_name, 'inclusion'])
 
         # Write exclusion bubbles
         for (x, y, radius) in exclusion_data:
-            lat, long = transformer.transform(x, y)
-            bubble_str = f'({lat}, {long}) +{radius}km'
+            bubble_str = format_bubble(transformer, x, y, radius)
             bubbles_writer.writerow(['exclusion', bubble_str, radius])
             output_writer.writerow([bubble_str, boundary_name, 'exclusion'])
 
-    # Calculate coverage statistics
-    coverage_stats = compute_coverage_stats(boundary, inclusion_bubbles, exclusion_bubbles)
-
     # Write statistics
     statistics_writer.writerow([
         boundary_name,
         coverage_stats["internal_inclusion"],
         coverage_stats["external_inclusion"],
         coverage_stats["exclusion"],
-        coverage_stats["net"]
+        coverage_stats["net"],
+        status,
+        '' if runtime is None else round(runtime, 3)
     ])
 
     create_boundary_visualization(
@@ -70,8 +276,275 @@ def process_boundary(boundary_item, output_type, transformer, output_writer, sta
         output_type
     )
 
+def process_revised_boundary(entry, boundary_item, previous, output_type, transformer, output_writer, statistics_writer, use_distance_field=False, time_budget=None, exact_coverage=False):
+    """
+    Processes a boundary of revised boundary data, carrying over as much of a previous run as still applies.
+
+    Unchanged boundaries reuse their previous bubbles and statistics as they are. Changed boundaries
+    keep the previous bubbles clear of the changed edges and only place new ones around them.
+    Boundaries without a finished result in the previous run are processed from scratch.
+
+    Args:
+        entry (dict): Catalogue entry of the boundary
+        boundary_item (tuple): (boundary name, boundary geometry)
+        previous (PreviousRun): The previous run and the boundary data it was made from
+        output_type (str): Type of boundaries being processed
+        transformer: Coordinate transformer object
+        output_writer: CSV writer for bubble data
+        statistics_writer: CSV writer for statistics
+        use_distance_field (bool): Use a distance field for boundaries processed from scratch
+        time_budget (float, optional): Seconds allowed for this boundary, from the start of processing it
+        exact_coverage (bool): Measure coverage of the bubbles as true circles instead of polygons
+
+    Returns:
+        tuple: (coverage statistics dict, 'unchanged', 'changed' or 'new')
+    """
+    boundary_name, boundary = boundary_item
+    previous_entry = previous.match(entry)
+    if previous_entry is None:
+        print(f'{boundary_name}: no finished result in the previous run, processing from scratch')
+        coverage_stats, _ = process_boundary(
+            boundary_item, output_type, transformer, output_writer, statistics_writer,
+            use_distance_field=use_distance_field, time_budget=time_budget, exact_coverage=exact_coverage
+        )
+        return coverage_stats, 'new'
+
+    start_time = time.perf_counter()
+    deadline = Deadline(time_budget)
+    previous_name = previous_entry['name']
+    previous_boundary = previous.load(previous_entry)
+    changes = changed_edges(boundary, previous_boundary)
+    if changes.is_empty:
+        print(f'{boundary_name}: unchanged, reusing previous bubbles')
+        coverage_stats = reuse_previous_results(
+            boundary_name, boundary, previous, previous_name, output_type, output_writer, statistics_writer,
+            time.perf_counter() - start_time
+        )
+        return coverage_stats, 'unchanged'
+
+    bubbles, counts = revise_bubbles(
+        boundary, previous_boundary, changes,
+        previous.circles(previous_name, 'inclusion'),
+        previous.circles(previous_name, 'exclusion'), deadline
+    )
+    inclusion_bubbles, _, exclusion_bubbles, _ = bubbles
+    coverage_stats = get_coverage_stats(boundary, inclusion_bubbles, exclusion_bubbles, exact_coverage)
+    runtime = time.perf_counter() - start_time
+    print(
+        f'{boundary_name}: {changes.length:.0f}m of outline changed; kept {counts["kept_inclusion"]} and placed '
+        f'{counts["placed_inclusion"]} inclusion bubbles, kept {counts["kept_exclusion"]} and placed '
+        f'{counts["placed_exclusion"]} exclusion bubbles'
+    )
+
+    write_boundary_results(
+        boundary_name,
+        boundary,
+        bubbles,
+        coverage_stats,
+        output_type,
+        transformer,
+        output_writer,
+        statistics_writer,
+        'cut_off' if deadline.reached else 'finished',
+        runtime
+    )
+    return coverage_stats, 'changed'
+
+def reuse_previous_results(boundary_name, boundary, previous, previous_name, output_type, output_writer, statistics_writer, runtime):
+    """
+    Writes a previous run's bubbles and statistics for a boundary that hasn't changed, copying its CSV and JPG.
+
+    Args:
+        boundary_name (str): Name of the boundary
+        boundary: Shapely geometry object representing the boundary
+        previous (PreviousRun): The previous run
+        previous_name (str): Name of the boundary in the previous run
+        output_type (str): Type of boundaries being processed
+        output_writer: CSV writer for bubble data
+        statistics_writer: CSV writer for statistics
+        runtime (float): Seconds spent checking the boundary
+
+    Returns:
+        dict: Coverage statistics for the boundary
+    """
+    row = previous.statistics[previous_name]
+    coverage_stats = {
+        "internal_inclusion": float(row['internal_inclusion_coverage']),
+        "external_inclusion": float(row['external_inclusion_coverage']),
+        "exclusion": float(row['exclusion_coverage']),
+        "net": float(row['net_coverage']),
+    }
+    for bubble, bubble_type in previous.bubble_rows[previous_name]:
+        output_writer.writerow([bubble, boundary_name, bubble_type])
+    statistics_writer.writerow([
+        boundary_name,
+        row['internal_inclusion_coverage'],
+        row['external_inclusion_coverage'],
+        row['exclusion_coverage'],
+        row['net_coverage'],
+        row.get('status') or 'finished',
+        round(runtime, 3)
+    ])
+
+    csv_file = os.path.join(get_output_directory(output_type, 'CSVs'), f'{sanitize_filename(boundary_name)}.csv')
+    previous_csv_file = os.path.join(previous.directory, 'CSVs', f'{sanitize_filename(previous_name)}.csv')
+    if os.path.exists(previous_csv_file) and os.path.abspath(previous_csv_file) != os.path.abspath(csv_file):
+        shutil.copyfile(previous_csv_file, csv_file)
+
+    jpeg_path = os.path.join(get_output_directory(output_type, 'JPGs'), f'{sanitize_filename(boundary_name)}.jpg')
+    previous_jpeg_path = os.path.join(previous.directory, 'JPGs', f'{sanitize_filename(previous_name)}.jpg')
+    if previous_name != boundary_name or not os.path.exists(previous_jpeg_path):
+        # The image is titled with the boundary's name, so a renamed boundary is drawn again
+        inclusion_circles = previous.circles(previous_name, 'inclusion')
+        exclusion_circles = previous.circles(previous_name, 'exclusion')
+        create_boundary_visualization(
+            boundary_name,
+            boundary,
+            [Point(x, y).buffer(radius) for x, y, radius in inclusion_circles.tolist()],
+            [Point(x, y).buffer(radius) for x, y, radius in exclusion_circles.tolist()],
+            coverage_stats,
+            output_type
+        )
+    elif os.path.abspath(previous_jpeg_path) != os.path.abspath(jpeg_path):
+        shutil.copyfile(previous_jpeg_path, jpeg_path)
     return coverage_stats
 
+def run_worker(queue_path, worker_id, lease_seconds, mirror=None, allow_unverified=False):
+    """
+    Claims and processes boundaries from a shared work queue until no jobs are left.
+
+    Per-boundary CSVs and JPGs are written straight to the output directory; the rows for
+    bubbles.csv and statistics.csv are stored in the queue for the merge step.
+
+    Args:
+        queue_path (str): Path to the queue database
+        worker_id (str): Identifier of this worker
+        lease_seconds (float): How long a claimed job is reserved before other workers may retry it; it is
+            renewed while the job runs, so this only bounds how long a dead worker's job waits
+        mirror (str, optional): Local directory or file:// URL to read boundary downloads from
+        allow_unverified (bool): If True, boundary downloads not matching their recorded digests are accepted
+    """
+    connection = work_queue.connect(queue_path)
+    settings = work_queue.get_settings(connection)
+    _, output_type = get_boundary_sources(settings['use_wards'], mirror=mirror, allow_unverified=allow_unverified)
+    setup_output_directories(output_type)
+    transformer = pyproj.Transformer.from_crs("epsg:27700", "epsg:4326")
+
+    while job := work_queue.claim_job(connection, worker_id, lease_seconds):
+        position, entry = job
+        print(f'Worker {worker_id} processing {entry["name"]}')
+        output_rows = work_queue.RowCollector()
+        statistics_rows = work_queue.RowCollector()
+        try:
+            with work_queue.LeaseHeartbeat(queue_path, position, worker_id, lease_seconds):
+                boundary_item = next(load_boundaries([entry]))
+                coverage_stats, _ = process_boundary(
+                    boundary_item, output_type, transformer, output_rows, statistics_rows,
+                    settings['simplify'], settings['distance_field'], settings['time_budget'], settings['refine'],
+                    exact_coverage=settings.get('exact_coverage', False)
+                )
+        except Exception as e:
+            print(f'Error processing {entry["name"]}: {e}')
+            work_queue.fail_job(connection, position, worker_id, repr(e))
+            continue
+
+        result = {
+            'bubble_rows': output_rows.rows,
+            'statistics_rows': statistics_rows.rows,
+            'coverage_stats': coverage_stats,
+        }
+        if not work_queue.complete_job(connection, position, worker_id, result):
+            print(f'Lease on {entry["name"]} was lost; result discarded')
+
+    print(f'Worker {worker_id} finished: {work_queue.get_job_counts(connection)}')
+
+def merge_queue_results(queue_path):
+    """
+    Writes bubbles.csv and statistics.csv from a finished work queue, exactly as a single-node run would.
+
+    Args:
+        queue_path (str): Path to the queue database
+    """
+    connection = work_queue.connect(queue_path)
+    output_type = 'wards' if work_queue.get_settings(connection)['use_wards'] else 'constituencies'
+    results = work_queue.get_results(connection)
+
+    setup_output_directories(output_type)
+    output_file, statistics_file, output_writer, statistics_writer = setup_output_files(output_type)
+    try:
+        statistics = SummaryStatistics()
+        for result in results:
+            for row in result['bubble_rows']:
+                output_writer.writerow(row)
+            for row in result['statistics_rows']:
+                statistics_writer.writerow(row)
+            statistics.add(result['coverage_stats'])
+        write_summary_statistics(statistics_writer, statistics)
+    finally:
+        output_file.close()
+        statistics_file.close()
+    print(f'Merged {work_queue.get_job_counts(connection).get("done", 0)} results into output/{output_type}')
+
+def run_hierarchy(constituency_entries, ward_entries, transformer, time_budget=None, refine=False, include_unnested=False, exact_coverage=False, use_distance_field=False):
+    """
+    Processes constituencies together with the wards nested within them, writing both sets of outputs.
+
+    Each ward is processed exactly as in a run over wards alone. The constituency's inclusion bubbles
+    are then picked from around the centres of its wards' bubbles rather than placed from scratch.
+
+    Args:
+        constituency_entries (list): Catalogue entries of the constituencies to process
+        ward_entries (list): Catalogue entries of all wards
+        transformer: Coordinate transformer object
+        time_budget (float, optional): Seconds allowed for each boundary, from the start of processing it
+        refine (bool): Improve each boundary's inclusion bubbles with a local-search refinement pass
+        include_unnested (bool): Also process wards not nested within any of the constituencies
+        exact_coverage (bool): Measure coverage of the bubbles as true circles instead of polygons
+        use_distance_field (bool): Place bubbles using distance fields instead of buffering each boundary per radius
+    """
+    start_time = time.perf_counter()
+    nesting = WardNesting(ward_entries)
+    print(f'Nested {len(ward_entries)} wards in {time.perf_counter() - start_time:.2f}s, not included in any boundary\'s runtime')
+    outputs = {}
+    for output_type in ('constituencies', 'wards'):
+        setup_output_directories(output_type)
+        outputs[output_type] = setup_output_files(output_type)
+    statistics = {output_type: SummaryStatistics() for output_type in outputs}
+
+    def process(boundary_item, output_type, **kwargs):
+        output_file, statistics_file, output_writer, statistics_writer = outputs[output_type]
+        coverage_stats, inclusion_data = process_boundary(
+            boundary_item, output_type, transformer, output_writer, statistics_writer,
+            time_budget=time_budget, refine=refine, exact_coverage=exact_coverage,
+            use_distance_field=use_distance_field, **kwargs
+        )
+        statistics[output_type].add(coverage_stats)
+        output_file.flush()
+        statistics_file.flush()
+        return inclusion_data
+
+    try:
+        for constituency_item in load_boundaries(constituency_entries):
+            ward_items = nesting.nested_wards(constituency_item[1])
+            print(f'{constituency_item[0]}: {len(ward_items)} nested wards')
+
+            seeds = []
+            for ward_item in ward_items:
+                inclusion_data = process(ward_item, 'wards')
+                seeds += [(x, y) for x, y, _ in inclusion_data]
+            process(constituency_item, 'constituencies', seeds=seeds)
+
+        if include_unnested:
+            for ward_item in load_boundaries(nesting.unassigned()):
+                process(ward_item, 'wards')
+
+        for output_type, (_, _, _, statistics_writer) in outputs.items():
+            write_summary_statistics(statistics_writer, statistics[output_type])
+    finally:
+        for output_file, statistics_file, _, _ in outputs.values():
+            output_file.close()
+            statistics_file.close()
+
 def main():
     """
     Main function that processes either constituency or ward boundaries based on command line arguments.
@@ -79,28 +552,139 @@ def main():
     """
     parser = argparse.ArgumentParser(description='Generate bubbles for constituencies or wards')
     parser.add_argument('--wards', action='store_true', help='Use wards instead of constituencies')
-    parser.add_argument('--region', type=str, help='Name of the region to process (exact match)')
+    parser.add_argument('--region', type=str, action='append', help='Name, code or glob pattern of a region to process (can be repeated)')
+    parser.add_argument('--region-regex', type=str, help='Regular expression matched against region names')
+    parser.add_argument('--region-file', type=str, help='File listing region names, codes or glob patterns, one per line')
+    parser.add_argument('--bbox', type=float, nargs=4, metavar=('MINX', 'MINY', 'MAXX', 'MAXY'), help='Only process regions intersecting this British National Grid bounding box')
+    parser.add_argument('--simplify', type=float, default=0, metavar='TOLERANCE', help='Simplify boundaries by up to this many meters before placing bubbles (topology preserving)')
+    parser.add_argument('--distance-field', action='store_true', help='Compute each boundary\'s distance field once instead of buffering it for every bubble radius')
+    parser.add_argument('--refine', action='store_true', help='Improve each boundary\'s bubbles by nudging, growing, shrinking, merging and removing them')
+    parser.add_argument('--time-budget', type=float, metavar='SECONDS', help='Stop placing bubbles in a boundary after this many seconds, keeping the best set found so far')
+    parser.add_argument('--run-time-budget', type=float, metavar='SECONDS', help='Stop placing bubbles once the whole run has taken this many seconds; remaining boundaries get their fallback bubbles only')
+    parser.add_argument('--hierarchy', action='store_true', help='Process the selected constituencies together with the wards nested within them, reusing work between the two levels')
+    parser.add_argument('--exact-coverage', action='store_true', help='Measure coverage statistics on true circles rather than bubble polygons')
+    parser.add_argument('--batch-size', type=int, default=0, help='Process boundaries in blocks of this size with the vectorized batch engine (useful for wards)')
+    parser.add_argument('--budget', type=int, help='Split this many inclusion bubbles across all selected boundaries, maximising coverage; written to allocated_bubbles.csv')
+    parser.add_argument('--population', type=str, help='With --budget: CSV with name and population columns, to maximise population covered instead of mean coverage')
+    parser.add_argument('--revise', type=str, metavar='PREVIOUS_OUTPUT', help='Output directory of a run on previous boundary data; only boundaries that changed since then are re-placed, and only near the changes')
+    parser.add_argument('--previous-boundaries', type=str, nargs='+', metavar='FILE', help='With --revise: the previous boundary files, relative to data/')
+    parser.add_argument('--mirror', type=str, help='Local directory or file:// URL to read boundary downloads from instead of the network')
+    parser.add_argument('--allow-unverified-downloads', action='store_true', help='Accept boundary downloads that do not match the SHA-256 digest recorded on their first download, e.g. after the source is republished')
+    parser.add_argument('--queue', type=str, help='Shared SQLite work queue for running across several machines')
+    parser.add_argument('--role', choices=['coordinator', 'worker', 'merge'], default='coordinator', help='With --queue: queue the selected boundaries, process queued boundaries, or merge the results')
+    parser.add_argument('--worker-id', type=str, default=work_queue.default_worker_id(), help='With --queue: identifier of this worker')
+    parser.add_argument('--lease', type=float, default=work_queue.DEFAULT_LEASE_SECONDS, help='With --queue: seconds a claimed boundary stays reserved after its worker stops renewing it, before another worker retries it')
     args = parser.parse_args()
+    if not 0 <= args.simplify <= 500:
+        parser.error('--simplify must be between 0 and 500 meters, the padding bubbles may extend beyond a boundary')
+    if args.batch_size and (args.simplify or args.distance_field or args.refine or args.time_budget or args.run_time_budget):
+        parser.error('--batch-size cannot be combined with --simplify, --distance-field, --refine or time budgets')
+    if args.batch_size and args.queue:
+        parser.error('--batch-size cannot be combined with --queue')
+
+    if args.hierarchy and (args.wards or args.batch_size or args.queue or args.simplify or args.run_time_budget):
+        parser.error('--hierarchy cannot be combined with --wards, --batch-size, --queue, --simplify or --run-time-budget')
+
+    if args.budget is not None and (args.batch_size or args.queue or args.hierarchy):
+        parser.error('--budget cannot be combined with --batch-size, --queue or --hierarchy')
+    if args.population and args.budget is None:
+        parser.error('--population requires --budget')
+
+    if args.revise and not args.previous_boundaries:
+        parser.error('--revise requires --previous-boundaries')
+    if args.revise and (args.batch_size or args.queue or args.hierarchy or args.simplify or args.refine or args.budget is not None):
+        parser.error('--revise cannot be combined with --batch-size, --queue, --hierarchy, --simplify, --refine or --budget')
+
+    if args.queue and args.role == 'worker':
+        run_worker(args.queue, args.worker_id, args.lease, args.mirror, args.allow_unverified_downloads)
+        return
+    if args.queue and args.role == 'merge':
+        merge_queue_results(args.queue)
+        return
+
+    sources, output_type = get_boundary_sources(args.wards, mirror=args.mirror, allow_unverified=args.allow_unverified_downloads)
+    entries = select_entries(
+        get_catalogue(sources), args.region, args.region_regex, args.region_file, args.bbox
+    )
+    if not entries:
+        return
 
-    boundaries, output_type = get_boundaries(args.wards)
-    boundaries = filter_boundaries(boundaries, args.region)
-    if not boundaries:
+    if args.queue:
+        settings = {
+            'use_wards': args.wards,
+            'simplify': args.simplify,
+            'distance_field': args.distance_field,
+            'time_budget': args.time_budget,
+            'refine': args.refine,
+            'exact_coverage': args.exact_coverage,
+        }
+        work_queue.enqueue_jobs(work_queue.connect(args.queue), entries, settings)
         return
 
+    if args.hierarchy:
+        ward_sources, _ = get_boundary_sources(True, mirror=args.mirror, allow_unverified=args.allow_unverified_downloads)
+        # Without a region selection every ward is wanted, including any outside all constituencies
+        include_unnested = not (args.region or args.region_regex or args.region_file or args.bbox)
+        run_hierarchy(
+            entries, get_catalogue(ward_sources), pyproj.Transformer.from_crs("epsg:27700", "epsg:4326"),
+            args.time_budget, args.refine, include_unnested, args.exact_coverage, args.distance_field
+        )
+        return
+
+    # Read the previous run before its output files are overwritten, in case they are the same
+    previous = get_previous_run(args.revise, args.previous_boundaries, sources) if args.revise else None
+
+    boundaries = load_boundaries(entries)
+
     setup_output_directories(output_type)
     transformer = pyproj.Transformer.from_crs("epsg:27700", "epsg:4326")
 
     output_file, statistics_file, output_writer, statistics_writer = setup_output_files(output_type)
+    curves_file, curves_writer = setup_curves_file(output_type) if args.budget is not None else (None, None)
 
     try:
-        statistics = [
-            process_boundary(boundary_item, output_type, transformer, output_writer, statistics_writer)
-            for boundary_item in boundaries
-        ]
+        # Boundaries are streamed from the source and dropped once written; only the
+        # coverage percentages are kept for the summary rows
+        statistics = SummaryStatistics()
+        if args.batch_size:
+            while batch := list(itertools.islice(boundaries, args.batch_size)):
+                for coverage_stats in process_boundary_batch(batch, output_type, transformer, output_writer, statistics_writer, args.exact_coverage):
+                    statistics.add(coverage_stats)
+                output_file.flush()
+                statistics_file.flush()
+        else:
+            run_deadline = Deadline(args.run_time_budget)
+            revision_counts = collections.Counter()
+            for entry, boundary_item in zip(entries, boundaries):
+                time_budget = args.time_budget
+                if args.run_time_budget is not None:
+                    remaining = max(run_deadline.expires_at - time.monotonic(), 0)
+                    time_budget = remaining if time_budget is None else min(time_budget, remaining)
+                if previous is not None:
+                    coverage_stats, change = process_revised_boundary(
+                        entry, boundary_item, previous, output_type, transformer, output_writer, statistics_writer,
+                        args.distance_field, time_budget, args.exact_coverage
+                    )
+                    revision_counts[change] += 1
+                else:
+                    coverage_stats, _ = process_boundary(
+                        boundary_item, output_type, transformer, output_writer, statistics_writer, args.simplify, args.distance_field, time_budget, args.refine,
+                        curves_writer=curves_writer, exact_coverage=args.exact_coverage
+                    )
+                statistics.add(coverage_stats)
+                output_file.flush()
+                statistics_file.flush()
+            if previous is not None:
+                print(f'Revised {len(entries)} boundaries: {revision_counts["unchanged"]} unchanged, {revision_counts["changed"]} changed, {revision_counts["new"]} new')
         write_summary_statistics(statistics_writer, statistics)
     finally:
         output_file.close()
         statistics_file.close()
+        if curves_file is not None:
+            curves_file.close()
+
+    if args.budget is not None:
+        allocate(output_type, args.budget, args.population)
 
 
 if __name__ == '__main__':
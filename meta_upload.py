@@ -20,14 +20,16 @@ def parse_bubbles(file_path):
     with open(path, 'r') as f:
         csv_text = f.read()
     reader = csv.DictReader(csv_text.splitlines())
-    pattern = re.compile(r'\(\s*([-0-9.]+),\s*([-0-9.]+)\)\s*\+(\d+(?:\.\d+)?)(km|mi)')
+    pattern = re.compile(r'\(\s*([-0-9.]+),\s*([-0-9.]+)\)\s*\+(\d+(?:\.\d+)?)(km|mi|m)')
 
     # Group circles by constituency name
     locations_by_name = defaultdict(list)
+    excluded_locations_by_name = defaultdict(list)
 
-    # Check if constituency column exists
+    # Check if constituency column exists (bubbles.csv and allocated_bubbles.csv call it name)
     fieldnames = reader.fieldnames
-    has_constituency_column = 'constituency' in fieldnames
+    name_column = 'constituency' if 'constituency' in fieldnames else 'name'
+    has_constituency_column = name_column in fieldnames
 
     # If no constituency column, use filename
     if not has_constituency_column:
@@ -41,11 +43,16 @@ def parse_bubbles(file_path):
 
         # Use constituency from CSV or filename
         if has_constituency_column:
-            constituency = row['constituency']
+            constituency = row[name_column]
         else:
             constituency = constituency_name
 
-        locations_by_name[constituency].append({
+        # Exclusion bubbles are targeted as excluded locations of the same ad set
+        locations = excluded_locations_by_name if row.get('type') == 'exclusion' else locations_by_name
+        # Meta takes radii in km or miles, so radii in meters are converted to km
+        if unit == 'm':
+            radius, unit = float(radius) / 1000, 'km'
+        locations[constituency].append({
             'latitude': float(lat),
             'longitude': float(lng),
             'radius': float(radius),
@@ -56,7 +63,7 @@ def parse_bubbles(file_path):
         print(f"No valid location data found in '{file_path}' or file is empty. Aborting ad set creation.")
         return
 
-    return locations_by_name
+    return locations_by_name, excluded_locations_by_name
 
 
 def init_ad_account():
@@ -90,7 +97,7 @@ def init_ad_account():
     return AdAccount(account_id)
 
 
-def create_ad_sets_with_geo_targeting(locations_by_name, prefix=""):
+def create_ad_sets_with_geo_targeting(locations_by_name, excluded_locations_by_name=None, prefix=""):
     account = init_ad_account()
 
     # First, create a campaign to hold our ad sets
@@ -122,6 +129,10 @@ def create_ad_sets_with_geo_targeting(locations_by_name, prefix=""):
                 'custom_locations': locations
             }
         }
+        if excluded_locations_by_name and excluded_locations_by_name.get(name):
+            targeting_spec['excluded_geo_locations'] = {
+                'custom_locations': excluded_locations_by_name[name]
+            }
 
         ad_set_name = f"{prefix}{name} Geofence" if prefix else f"{name} Geofence"
 
@@ -159,6 +170,7 @@ if __name__ == "__main__":
     )
     args = parser.parse_args()
 
-    locations_data = parse_bubbles(args.file)
-    if locations_data:
-        create_ad_sets_with_geo_targeting(locations_data, args.prefix)
+    parsed = parse_bubbles(args.file)
+    if parsed:
+        locations_data, excluded_locations_data = parsed
+        create_ad_sets_with_geo_targeting(locations_data, excluded_locations_data, args.prefix)
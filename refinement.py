@@ -0,0 +1,323 @@
+"""Local-search refinement of inclusion bubbles, scored with incremental coverage deltas."""
+
+import heapq
+import math
+
+import numpy as np
+import shapely
+from shapely import STRtree, box, contains_xy, prepare
+from shapely.geometry import Point
+
+TARGET_SAMPLE_POINTS = 20000
+MIN_SAMPLE_SPACING = 25
+NUDGE_DIRECTIONS = [(math.cos(angle), math.sin(angle)) for angle in np.arange(0, 2 * math.pi, math.pi / 4)]
+
+
+class CoverageSamples:
+    """
+    Points sampled on a grid over the part of a boundary that counts towards net coverage.
+
+    Keeps, for every sample, how many inclusion bubbles cover it, so the coverage change of
+    adding, removing or moving one bubble is found from the samples near that bubble alone,
+    rather than by re-unioning every bubble.
+    """
+
+    def __init__(self, boundary, exclusion_bubbles):
+        """
+        Args:
+            boundary: Shapely geometry the coverage is measured against
+            exclusion_bubbles (list): Exclusion bubble geometries; samples inside them don't count
+        """
+        minx, miny, maxx, maxy = boundary.bounds
+        spacing = max(math.sqrt(boundary.area / TARGET_SAMPLE_POINTS), MIN_SAMPLE_SPACING)
+        grid_x, grid_y = np.meshgrid(
+            np.arange(minx + spacing / 2, maxx, spacing), np.arange(miny + spacing / 2, maxy, spacing)
+        )
+        x, y = grid_x.ravel(), grid_y.ravel()
+
+        prepare(boundary)
+        eligible = contains_xy(boundary, x, y)
+        if exclusion_bubbles:
+            points = shapely.points(x[eligible], y[eligible])
+            excluded, _ = STRtree(exclusion_bubbles).query(points, predicate='intersects')
+            keep = np.ones(len(points), dtype=bool)
+            keep[excluded] = False
+            eligible[np.flatnonzero(eligible)[~keep]] = False
+
+        self.x = x[eligible]
+        self.y = y[eligible]
+        self.point_area = spacing * spacing
+        self.counts = np.zeros(len(self.x), dtype=np.int32)
+        self.tree = STRtree(shapely.points(self.x, self.y))
+
+    def inside(self, x, y, radius):
+        """
+        Returns the indices of samples within a circle.
+
+        Args:
+            x (float): Circle centre x
+            y (float): Circle centre y
+            radius (float): Circle radius in meters
+
+        Returns:
+            np.ndarray: Sample indices
+        """
+        candidates = self.tree.query(box(x - radius, y - radius, x + radius, y + radius))
+        dx = self.x[candidates] - x
+        dy = self.y[candidates] - y
+        return candidates[dx * dx + dy * dy <= radius * radius]
+
+    def add(self, circle):
+        self.counts[self.inside(*circle)] += 1
+
+    def remove(self, circle):
+        self.counts[self.inside(*circle)] -= 1
+
+    def removal_loss(self, circle):
+        """
+        Counts the samples only this circle covers.
+        """
+        return int(np.count_nonzero(self.counts[self.inside(*circle)] == 1))
+
+    def addition_gain(self, circle):
+        """
+        Counts the samples this circle would newly cover.
+        """
+        return int(np.count_nonzero(self.counts[self.inside(*circle)] == 0))
+
+    def replacement_delta(self, old_circles, new_circles):
+        """
+        Change in covered samples from replacing some circles with others.
+        """
+        for circle in old_circles:
+            self.remove(circle)
+        gain = 0
+        for circle in new_circles:
+            gain += self.addition_gain(circle)
+            self.add(circle)
+        for circle in new_circles:
+            self.remove(circle)
+        loss = 0
+        for circle in old_circles:
+            loss += self.addition_gain(circle)
+            self.add(circle)
+        return gain - loss
+
+    def covered(self):
+        return int(np.count_nonzero(self.counts))
+
+
+def greedy_coverage_order(samples, circles, limit=None, deadline=None):
+    """
+    Picks circles one at a time, each time the one covering the most samples not covered yet, adding it to `samples`.
+
+    Gains only shrink as circles are picked, so stale gains are upper bounds and each circle is only
+    re-scored when it reaches the top of the heap. Circles that would cover nothing new are never picked.
+
+    Args:
+        samples (CoverageSamples): Coverage samples, updated with each picked circle
+        circles (list): (x, y, radius in meters) candidate circles
+        limit (int, optional): Stop after picking this many circles
+        deadline (Deadline, optional): Stop picking once this passes
+
+    Returns:
+        tuple: (indices of the picked circles in the order picked, number of samples each newly covered)
+    """
+    # Start from the number of samples each circle could cover at most
+    spacing = math.sqrt(samples.point_area)
+    heap = [(-math.pi * (radius + spacing) ** 2 / samples.point_area, i) for i, (_, _, radius) in enumerate(circles)]
+    heapq.heapify(heap)
+
+    order = []
+    gains = []
+    while heap and (limit is None or len(order) < limit):
+        if deadline is not None and deadline.expired():
+            print(f"   Time budget reached with {len(order)} inclusion bubbles")
+            break
+        _, i = heapq.heappop(heap)
+        gain = samples.addition_gain(circles[i])
+        if gain == 0:
+            continue
+        if heap and gain < -heap[0][0]:
+            heapq.heappush(heap, (-gain, i))
+            continue
+        samples.add(circles[i])
+        order.append(i)
+        gains.append(gain)
+    return order, gains
+
+
+def is_contained(containment_boundary, circle):
+    x, y, radius = circle
+    return containment_boundary.contains(Point(x, y).buffer(radius))
+
+
+def refine_bubbles(boundary, containment_boundary, inclusion_bubbles, inclusion_data, exclusion_bubbles,
+                   max_passes=10, min_improvement=0.0005, deadline=None):
+    """
+    Improves an inclusion bubble layout by local search: removing, shrinking, growing, nudging and merging bubbles.
+
+    Radii stay multiples of 1km and every changed bubble stays within the containment boundary.
+    A move is kept if it covers more of the boundary, or the same with fewer or smaller bubbles.
+    Bubbles that were not within the containment boundary to start with (e.g. the minimum bounding
+    circle fallback) are left untouched. Coverage is judged on grid samples, so the net coverage
+    measured afterwards can be up to about 0.1 percentage points lower than before.
+
+    Args:
+        boundary: Shapely geometry coverage is measured against
+        containment_boundary: Shapely geometry (the padded boundary) bubbles must stay within
+        inclusion_bubbles (list): List of inclusion bubble geometries
+        inclusion_data (list): List of inclusion bubble data [x, y, radius in meters]
+        exclusion_bubbles (list): List of exclusion bubble geometries
+        max_passes (int): Maximum number of passes over the bubbles
+        min_improvement (float): Stop once a pass improves net coverage by less than this fraction
+        deadline (Deadline, optional): Stop refining once this passes. Every move keeps or improves the
+            layout, so the bubbles as they are then are the best found so far
+
+    Returns:
+        tuple: (list of inclusion bubble geometries, list of inclusion bubble data [x, y, radius])
+    """
+    if deadline is not None and deadline.expired():
+        print('   Time budget reached before refinement')
+        return inclusion_bubbles, inclusion_data
+
+    prepare(containment_boundary)
+    samples = CoverageSamples(boundary, exclusion_bubbles)
+    if len(samples.x) == 0:
+        return inclusion_bubbles, inclusion_data
+
+    fixed = []
+    circles = []
+    for bubble, (x, y, radius) in zip(inclusion_bubbles, inclusion_data):
+        circle = (x, y, radius)
+        if is_contained(containment_boundary, circle):
+            circles.append(circle)
+        else:
+            fixed.append((bubble, [x, y, radius]))
+        samples.add(circle)
+
+    initial_covered = samples.covered()
+    nudge_fraction = 0.5
+    for _ in range(max_passes):
+        if deadline is not None and deadline.expired():
+            print('   Time budget reached during refinement')
+            break
+        covered_before = samples.covered()
+        changed = refine_pass(samples, containment_boundary, circles, nudge_fraction, deadline)
+        improvement = (samples.covered() - covered_before) / len(samples.x)
+        if not changed or (improvement < min_improvement and nudge_fraction <= 0.125):
+            break
+        if improvement < min_improvement:
+            nudge_fraction /= 2
+
+    print(
+        f'   Refinement: {len(inclusion_data)} -> {len(circles) + len(fixed)} inclusion bubbles, '
+        f'net coverage {100 * initial_covered / len(samples.x):.2f}% -> {100 * samples.covered() / len(samples.x):.2f}% (sampled)'
+    )
+
+    refined_bubbles = [bubble for bubble, _ in fixed]
+    refined_data = [data for _, data in fixed]
+    for x, y, radius in circles:
+        refined_bubbles.append(Point(x, y).buffer(radius))
+        refined_data.append([x, y, int(radius)])
+    return refined_bubbles, refined_data
+
+
+def refine_pass(samples, containment_boundary, circles, nudge_fraction, deadline=None):
+    """
+    Makes one pass of local-search moves over the bubbles, modifying `circles` in place.
+
+    Args:
+        samples (CoverageSamples): Coverage samples, kept in step with `circles`
+        containment_boundary: Shapely geometry bubbles must stay within
+        circles (list): (x, y, radius in meters) of each movable bubble
+        nudge_fraction (float): Nudge distance as a fraction of each bubble's radius
+        deadline (Deadline, optional): Stop moving bubbles once this passes
+
+    Returns:
+        bool: True if any move was made
+    """
+    changed = False
+
+    # Remove bubbles that cover nothing on their own
+    for circle in sorted(circles, key=samples.removal_loss):
+        if samples.removal_loss(circle) == 0:
+            samples.remove(circle)
+            circles.remove(circle)
+            changed = True
+
+    for i, circle in enumerate(circles):
+        if deadline is not None and deadline.expired():
+            return changed
+        x, y, radius = circle
+        candidates = []
+
+        # Shrink if the outer ring covers nothing on its own; grow if there is room
+        if radius > 1000:
+            candidates.append((x, y, radius - 1000))
+        candidates.append((x, y, radius + 1000))
+
+        # Nudge in each direction
+        step = radius * nudge_fraction
+        candidates += [(x + dx * step, y + dy * step, radius) for dx, dy in NUDGE_DIRECTIONS]
+
+        best, best_delta = None, 0
+        for candidate in candidates:
+            delta = samples.replacement_delta([circle], [candidate])
+            is_cheaper = candidate[2] < radius and delta == 0
+            if (delta > best_delta or (is_cheaper and best is None)) and is_contained(containment_boundary, candidate):
+                best, best_delta = candidate, delta
+        if best is not None:
+            samples.remove(circle)
+            samples.add(best)
+            circles[i] = best
+            changed = True
+
+    return merge_overlapping(samples, containment_boundary, circles, deadline) or changed
+
+
+def merge_overlapping(samples, containment_boundary, circles, deadline=None):
+    """
+    Replaces pairs of heavily overlapping bubbles with a single bubble covering both, where that loses nothing.
+
+    Args:
+        samples (CoverageSamples): Coverage samples, kept in step with `circles`
+        containment_boundary: Shapely geometry bubbles must stay within
+        circles (list): (x, y, radius in meters) of each movable bubble, modified in place
+        deadline (Deadline, optional): Stop merging once this passes
+
+    Returns:
+        bool: True if any bubbles were merged
+    """
+    changed = False
+    i = 0
+    while i < len(circles):
+        if deadline is not None and deadline.expired():
+            break
+        x1, y1, r1 = circles[i]
+        for j in range(i + 1, len(circles)):
+            x2, y2, r2 = circles[j]
+            distance = math.hypot(x2 - x1, y2 - y1)
+            if distance > max(r1, r2):
+                continue
+
+            # Smallest circle enclosing both, with its radius rounded up to a whole number of km
+            if distance + r2 <= r1:
+                merged = circles[i]
+            elif distance + r1 <= r2:
+                merged = circles[j]
+            else:
+                enclosing_radius = (distance + r1 + r2) / 2
+                t = (enclosing_radius - r1) / distance
+                merged = (x1 + (x2 - x1) * t, y1 + (y2 - y1) * t, math.ceil(enclosing_radius / 1000) * 1000)
+            if samples.replacement_delta([circles[i], circles[j]], [merged]) >= 0 and is_contained(containment_boundary, merged):
+                samples.remove(circles[i])
+                samples.remove(circles[j])
+                samples.add(merged)
+                circles[i] = merged
+                del circles[j]
+                changed = True
+                break
+        else:
+            i += 1
+    return changed
@@ -0,0 +1,343 @@
+"""Revision-diff mode: carries a previous run's bubbles over to revised boundary data, re-placing them only near changes."""
+
+import csv
+import os
+import re
+from collections import defaultdict
+
+import fiona
+import numpy as np
+import pyproj
+import shapely
+from shapely import prepare
+from shapely.geometry import Point
+
+from bubble_generation import BUBBLE_LIMIT, EXCLUSION_RADIUS, EXCLUSION_STEP, calculate_radius_upper_bound, create_minimum_bounding_circle, generate_inclusion_bubbles
+from catalogue import get_catalogue, load_boundaries
+from circle_union import polygon_parts
+from compare_runs import parse_bubble, read_statistics
+from refinement import CoverageSamples, greedy_coverage_order
+
+PADDING = 500
+# Outlines that moved by less than this many meters count as unchanged
+CHANGE_TOLERANCE = 1
+# Exclusion bubble centres sit 1km outside the outline, so those further than this from a change are unaffected by it
+EXCLUSION_REACH = EXCLUSION_RADIUS + EXCLUSION_STEP
+
+
+def find_field(fields, key):
+    """
+    Finds the field of a boundary file matching a key, allowing for a different year in its name (e.g. WD24CD for WD25CD).
+
+    Args:
+        fields (list): Field names of the boundary file
+        key (str): Key field name used by the current boundary data
+
+    Returns:
+        str: The matching field name, or None if there isn't one
+    """
+    if key in fields:
+        return key
+    pattern = re.compile(re.sub(r'\d+', r'\\d+', re.escape(key)) + '$')
+    matches = sorted(field for field in fields if pattern.match(field))
+    return matches[0] if matches else None
+
+
+def get_previous_sources(shapefile_paths, sources):
+    """
+    Describes a previous version of the boundary data the way get_boundary_sources describes the current one.
+
+    Args:
+        shapefile_paths (list): Paths of the previous boundary files, relative to data/
+        sources (list): (shapefile path, key1, key2) tuples of the current boundary data
+
+    Returns:
+        list: (shapefile path, key1, key2) tuples of the previous boundary data
+
+    Raises:
+        ValueError: If a previous file has none of the current data's key fields
+    """
+    previous_sources = []
+    for shapefile_path in shapefile_paths:
+        with fiona.open('data/' + shapefile_path) as boundaries_file:
+            fields = list(boundaries_file.schema['properties'])
+        for _, key1, key2 in sources:
+            keys = (find_field(fields, key1), find_field(fields, key2) if key2 else None)
+            if keys[0] and (keys[1] or not key2):
+                previous_sources.append((shapefile_path, *keys))
+                break
+        else:
+            raise ValueError(f'data/{shapefile_path} has none of the key fields of the current boundary data')
+    return previous_sources
+
+
+def read_bubble_rows(output_directory):
+    """
+    Reads a run's bubbles.csv, keeping each boundary's rows in order.
+
+    Args:
+        output_directory (str): Run output directory, e.g. output/wards
+
+    Returns:
+        dict: Boundary name -> list of (bubble string, bubble type)
+    """
+    rows = defaultdict(list)
+    with open(os.path.join(output_directory, 'bubbles.csv')) as f:
+        for row in csv.DictReader(f):
+            rows[row['name']].append((row['bubble'], row['type']))
+    return rows
+
+
+class PreviousRun:
+    """
+    The outputs of a previous run and the boundary data it was made from, matched to the current
+    boundaries by name or, failing that, by code.
+    """
+
+    def __init__(self, output_directory, previous_catalogue):
+        """
+        Args:
+            output_directory (str): The previous run's output directory, e.g. output/wards
+            previous_catalogue (list): Catalogue entries of the previous boundary data
+        """
+        self.directory = output_directory
+        self.statistics = read_statistics(output_directory)
+        self.bubble_rows = read_bubble_rows(output_directory)
+        self.by_name = {entry['name']: entry for entry in previous_catalogue}
+        self.by_code = {entry['code']: entry for entry in previous_catalogue if entry['code']}
+        self.transformer = pyproj.Transformer.from_crs("epsg:4326", "epsg:27700")
+
+    def match(self, entry):
+        """
+        Finds the previous version of a boundary with a finished result in the previous run.
+
+        Args:
+            entry (dict): Catalogue entry of the current boundary
+
+        Returns:
+            dict: Catalogue entry of the previous boundary, or None if there isn't a usable one
+        """
+        previous_entry = self.by_name.get(entry['name']) or self.by_code.get(entry['code'])
+        if previous_entry is None:
+            return None
+        row = self.statistics.get(previous_entry['name'])
+        if row is None or row.get('status', 'finished') != 'finished':
+            return None
+        return previous_entry
+
+    def load(self, previous_entry):
+        """
+        Loads the previous geometry of a boundary.
+
+        Args:
+            previous_entry (dict): Catalogue entry of the previous boundary
+
+        Returns:
+            Shapely geometry of the previous boundary
+        """
+        return next(load_boundaries([previous_entry]))[1]
+
+    def circles(self, name, bubble_type):
+        """
+        Reads a boundary's previous bubbles of one type back into British National Grid circles.
+
+        Args:
+            name (str): Name of the boundary in the previous run
+            bubble_type (str): 'inclusion' or 'exclusion'
+
+        Returns:
+            np.ndarray: (n, 3) array of x, y and radius in meters
+        """
+        circles = []
+        for bubble, row_type in self.bubble_rows.get(name, []):
+            parsed = parse_bubble(bubble)
+            if row_type != bubble_type or parsed is None:
+                continue
+            lat, long, radius = parsed
+            x, y = self.transformer.transform(lat, long)
+            circles.append((x, y, radius))
+        return np.array(circles, dtype=float).reshape(-1, 3)
+
+
+def polygon_outline(boundary):
+    """
+    Returns the rings of a boundary's polygons as one geometry, ignoring any stray lines or points.
+
+    Args:
+        boundary: Shapely geometry, possibly a GeometryCollection from make_valid
+
+    Returns:
+        MultiLineString of every exterior and interior ring
+    """
+    polygons = polygon_parts(boundary)
+    return shapely.multilinestrings(shapely.get_rings(polygons)) if len(polygons) else shapely.MultiLineString()
+
+
+def changed_edges(boundary, previous_boundary):
+    """
+    Finds the parts of a boundary's outline that moved, in either its current or its previous geometry.
+
+    Args:
+        boundary: Current geometry of the boundary
+        previous_boundary: Previous geometry of the boundary
+
+    Returns:
+        Shapely geometry of the changed edges, empty if the outline moved by less than CHANGE_TOLERANCE everywhere
+    """
+    if shapely.equals_exact(shapely.normalize(boundary), shapely.normalize(previous_boundary), CHANGE_TOLERANCE):
+        return shapely.MultiLineString()
+    outline = polygon_outline(boundary)
+    previous_outline = polygon_outline(previous_boundary)
+    return shapely.union(
+        shapely.difference(outline, shapely.buffer(previous_outline, CHANGE_TOLERANCE)),
+        shapely.difference(previous_outline, shapely.buffer(outline, CHANGE_TOLERANCE))
+    )
+
+
+def revise_exclusion_bubbles(boundary, changes, previous_circles):
+    """
+    Keeps the previous exclusion bubbles away from the changes and places new ones, as
+    generate_exclusion_bubbles would, along the changed parts of the outline.
+
+    Only the part of the boundary near the changes is buffered, together with the whole of any hole
+    it reaches into, so the hole stays a hole rather than opening into a bay. Any outline the clipping
+    adds lies beyond the reach of the changes, so no centres are placed along it.
+
+    Args:
+        boundary: Current geometry of the boundary
+        changes: Shapely geometry of the changed edges
+        previous_circles (np.ndarray): (n, 3) array of the previous exclusion bubbles' x, y and radius
+
+    Returns:
+        tuple: (kept (n, 2) centres, placed (m, 2) centres)
+    """
+    previous_centres = shapely.points(previous_circles[:, :2])
+    kept = previous_circles[shapely.distance(changes, previous_centres) > EXCLUSION_REACH, :2]
+
+    # Centres within reach of the changes are nearest to parts of the boundary within this distance of them
+    clip_distance = EXCLUSION_REACH + EXCLUSION_RADIUS + EXCLUSION_STEP
+    clip = shapely.buffer(changes, clip_distance)
+    rings, ring_index = shapely.get_rings(polygon_parts(boundary), return_index=True)
+    is_exterior = np.zeros(len(rings), dtype=bool)
+    is_exterior[np.unique(ring_index, return_index=True)[1]] = True
+    holes = shapely.polygons(rings[~is_exterior])
+    holes = holes[shapely.intersects(holes, clip)]
+    if len(holes):
+        clip = shapely.union_all([clip, *shapely.buffer(holes, clip_distance)])
+    nearby = shapely.intersection(boundary, clip)
+
+    exteriors = shapely.get_exterior_ring(polygon_parts(shapely.buffer(nearby, EXCLUSION_RADIUS)))
+    exteriors = exteriors[~shapely.is_empty(exteriors)]
+    points = np.concatenate([
+        shapely.line_interpolate_point(exterior, np.arange(0, exterior.length, EXCLUSION_STEP))
+        for exterior in exteriors
+    ]) if len(exteriors) else np.empty(0, dtype=object)
+    placed = points[shapely.distance(changes, points) <= EXCLUSION_REACH]
+    return kept, shapely.get_coordinates(placed).reshape(-1, 2)
+
+
+def revise_inclusion_bubbles(boundary, previous_boundary, changes, previous_circles, exclusion_bubbles, deadline=None):
+    """
+    Keeps the previous inclusion bubbles that still fit and are clear of the changes, then fills
+    the area around the changes with new bubbles picked greedily for the net coverage they add.
+
+    Args:
+        boundary: Current geometry of the boundary
+        previous_boundary: Previous geometry of the boundary
+        changes: Shapely geometry of the changed edges
+        previous_circles (np.ndarray): (n, 3) array of the previous inclusion bubbles' x, y and radius
+        exclusion_bubbles (list): The boundary's revised exclusion bubble geometries
+        deadline (Deadline, optional): Stop placing new bubbles once this passes
+
+    Returns:
+        tuple: (kept circles, placed circles), each a list of (x, y, radius in meters)
+    """
+    padded_boundary = boundary.buffer(PADDING)
+    prepare(padded_boundary)
+    centres = shapely.points(previous_circles[:, :2])
+    radii = previous_circles[:, 2]
+    # A bubble within the padding of a changed edge would have been placed differently, so it is re-placed
+    contained = shapely.contains(padded_boundary, shapely.buffer(centres, radii))
+    clear = contained & (shapely.distance(changes, centres) > radii + PADDING)
+    kept = [tuple(circle) for circle in previous_circles[clear].tolist()]
+
+    # Re-place bubbles within reach of the changes, the dropped bubbles and any area the boundary gained
+    dropped = centres[~clear]
+    reach = 2 * max(radii[~clear].max(initial=0), 1000) + PADDING
+    gained = shapely.buffer(shapely.difference(boundary, previous_boundary), -CHANGE_TOLERANCE)
+    affected = shapely.buffer(shapely.union_all([changes, shapely.multipoints(dropped), gained]), reach)
+    area = shapely.intersection(padded_boundary, affected)
+    if shapely.is_empty(area) or len(kept) >= BUBBLE_LIMIT:
+        return kept, []
+
+    radius = calculate_radius_upper_bound(area)
+    _, candidate_data = generate_inclusion_bubbles(area, radius, deadline=deadline)
+    # Dropped bubbles that still fit are candidates too, and are picked again if they still add the most
+    candidates = [tuple(data) for data in candidate_data]
+    candidates += [tuple(circle) for circle in previous_circles[contained & ~clear].tolist()]
+    sampled_area = shapely.intersection(boundary, area)
+    if not candidates or shapely.is_empty(sampled_area):
+        return kept, []
+    samples = CoverageSamples(sampled_area, exclusion_bubbles)
+    if len(samples.x) == 0:
+        return kept, []
+
+    for circle in kept:
+        samples.add(circle)
+    order, _ = greedy_coverage_order(samples, candidates, BUBBLE_LIMIT - len(kept), deadline)
+    return kept, [candidates[i] for i in order]
+
+
+def revise_bubbles(boundary, previous_boundary, changes, previous_inclusion, previous_exclusion, deadline=None):
+    """
+    Carries a boundary's previous bubbles over to its revised geometry, re-placing only those near the changes.
+
+    Args:
+        boundary: Current geometry of the boundary
+        previous_boundary: Previous geometry of the boundary
+        changes: Shapely geometry of the changed edges, from changed_edges
+        previous_inclusion (np.ndarray): (n, 3) array of the previous inclusion bubbles' x, y and radius in meters
+        previous_exclusion (np.ndarray): (m, 3) array of the previous exclusion bubbles' x, y and radius in meters
+        deadline (Deadline, optional): Time limit for placing new inclusion bubbles
+
+    Returns:
+        tuple: ((list of inclusion bubble geometries, list of inclusion bubble data [x, y, radius],
+                 list of exclusion bubble geometries, list of exclusion bubble data [x, y, radius]),
+                dict of kept and placed bubble counts)
+    """
+    kept_exclusion, placed_exclusion = revise_exclusion_bubbles(boundary, changes, previous_exclusion)
+    exclusion_data = [[x, y, EXCLUSION_RADIUS] for x, y in np.concatenate([kept_exclusion, placed_exclusion]).tolist()]
+    exclusion_bubbles = [Point(x, y).buffer(EXCLUSION_RADIUS) for x, y, _ in exclusion_data]
+
+    kept_inclusion, placed_inclusion = revise_inclusion_bubbles(
+        boundary, previous_boundary, changes, previous_inclusion, exclusion_bubbles, deadline
+    )
+    circles = kept_inclusion + placed_inclusion
+    inclusion_bubbles = [Point(x, y).buffer(radius) for x, y, radius in circles]
+    inclusion_data = [[x, y, int(radius)] for x, y, radius in circles]
+    if not inclusion_bubbles:
+        bubble, bubble_data = create_minimum_bounding_circle(boundary)
+        inclusion_bubbles, inclusion_data = [bubble], [bubble_data]
+
+    counts = {
+        'kept_inclusion': len(kept_inclusion),
+        'placed_inclusion': len(placed_inclusion),
+        'kept_exclusion': len(kept_exclusion),
+        'placed_exclusion': len(placed_exclusion),
+    }
+    return (inclusion_bubbles, inclusion_data, exclusion_bubbles, exclusion_data), counts
+
+
+def get_previous_run(output_directory, shapefile_paths, sources):
+    """
+    Reads a previous run and catalogues the boundary data it was made from.
+
+    Args:
+        output_directory (str): The previous run's output directory
+        shapefile_paths (list): Paths of the previous boundary files, relative to data/
+        sources (list): (shapefile path, key1, key2) tuples of the current boundary data
+
+    Returns:
+        PreviousRun: The previous run
+    """
+    return PreviousRun(output_directory, get_catalogue(get_previous_sources(shapefile_paths, sources)))
@@ -0,0 +1,48 @@
+"""Optional boundary simplification applied before bubble generation."""
+
+from shapely import simplify, get_num_coordinates
+from shapely.validation import make_valid
+
+
+def simplify_boundary(boundary, tolerance):
+    """
+    Simplifies a boundary while preserving its topology.
+
+    Every point of the simplified boundary's outline lies within `tolerance` of the original
+    outline, so anything kept at least `tolerance` inside the simplified boundary is also
+    inside the original.
+
+    Args:
+        boundary: A shapely geometry object representing the boundary
+        tolerance (float): Maximum distance in meters the outline may move
+
+    Returns:
+        Simplified shapely geometry
+    """
+    return make_valid(simplify(boundary, tolerance, preserve_topology=True))
+
+
+def report_simplification(boundary, simplified_boundary, coverage_stats):
+    """
+    Prints the vertex reduction achieved by simplification and how far it moved the boundary.
+
+    The area gained or lost by simplifying bounds how much the boundary's coverage could differ
+    between the two versions, without measuring the bubbles a second time.
+
+    Args:
+        boundary: The original boundary geometry
+        simplified_boundary: The simplified boundary geometry bubbles were placed in
+        coverage_stats (dict): Coverage statistics measured against the original boundary
+    """
+    original_vertices = get_num_coordinates(boundary)
+    simplified_vertices = get_num_coordinates(simplified_boundary)
+    reduction = 100 * (1 - simplified_vertices / original_vertices) if original_vertices else 0
+    print(
+        f'   Simplified {original_vertices} vertices to {simplified_vertices} ({reduction:.1f}% fewer)'
+    )
+
+    changed_area = 100 * boundary.symmetric_difference(simplified_boundary).area / boundary.area if boundary.area else 0
+    print(
+        f'   Net coverage {coverage_stats["net"]:.2f}% against the original boundary; '
+        f'simplifying changed {changed_area:.2f}% of its area, roughly the most its coverage could differ against the simplified boundary'
+    )
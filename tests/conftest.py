@@ -0,0 +1,36 @@
+"""Shared fixture boundaries: small synthetic shapes in British National Grid coordinates."""
+
+import numpy as np
+import pytest
+from shapely.geometry import MultiPolygon, Polygon, box
+
+
+def wobbly_polygon(x, y, radius, vertices=400, seed=0):
+    """
+    Builds a star-ish polygon with a noisy outline, like a simplified ward.
+
+    Args:
+        x (float): Centre easting
+        y (float): Centre northing
+        radius (float): Mean radius in meters
+        vertices (int): Number of outline vertices
+        seed (int): Seed for the outline noise
+
+    Returns:
+        Polygon: The fixture boundary
+    """
+    rng = np.random.default_rng(seed)
+    angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    radii = radius * (1 + 0.2 * np.sin(5 * angles)) + rng.normal(0, radius / 80, vertices)
+    return Polygon(np.c_[x + radii * np.cos(angles), y + radii * np.sin(angles)]).buffer(0)
+
+
+@pytest.fixture
+def fixture_boundaries():
+    """(name, geometry) pairs covering the shapes the bubble engines treat differently."""
+    return [
+        ('Wobbly', wobbly_polygon(400000, 300000, 4000)),
+        ('Square with hole', box(410000, 300000, 416000, 306000).difference(box(412000, 302000, 414000, 304000))),
+        ('Two islands', MultiPolygon([box(420000, 300000, 424000, 303000), box(425000, 300000, 427500, 302500)])),
+        ('Sliver', box(430000, 300000, 430800, 306000)),
+    ]
@@ -0,0 +1,115 @@
+import csv
+import itertools
+
+import numpy as np
+import pytest
+
+import allocation
+from allocation import allocate_budget, read_curves, write_allocation
+
+COVERAGES = {
+    'Steep': [40, 60, 70, 75],
+    'Shallow': [10, 20, 30],
+    'Single': [90],
+    'Empty': [],
+}
+
+
+def make_curves(coverages=COVERAGES):
+    return {
+        name: {
+            'inclusion': [(f'(51.{index}{rank}, -0.1) +2000m', coverage) for rank, coverage in enumerate(curve)],
+            'exclusion': [f'(52.{index}, -1.5) +1000m'] if curve else [],
+        }
+        for index, (name, curve) in enumerate(coverages.items())
+    }
+
+
+def total_coverage(counts):
+    return sum(COVERAGES[name][count - 1] if count else 0 for name, count in counts.items())
+
+
+@pytest.mark.parametrize('budget', [0, 1, 3, 5, 8, 100])
+def test_allocation_stays_within_budget_and_is_best(budget):
+    counts = allocate_budget(make_curves(), budget)
+
+    available = sum(len(curve) for curve in COVERAGES.values())
+    assert sum(counts.values()) == min(budget, available)
+    assert all(count <= len(COVERAGES[name]) for name, count in counts.items())
+
+    best = max(
+        total_coverage(dict(zip(COVERAGES, split)))
+        for split in itertools.product(*(range(len(curve) + 1) for curve in COVERAGES.values()))
+        if sum(split) <= budget
+    )
+    assert total_coverage(counts) == best
+
+
+def test_weights_favour_larger_population():
+    counts = allocate_budget(make_curves(), 1, weights={'Shallow': 1000, 'Steep': 1, 'Single': 1})
+    assert counts['Shallow'] == 1
+
+
+def test_gains_are_computed_once_per_boundary(monkeypatch):
+    calls = []
+    diff = np.diff
+    monkeypatch.setattr(allocation.np, 'diff', lambda *args, **kwargs: calls.append(1) or diff(*args, **kwargs))
+    allocate_budget(make_curves(), 100)
+    assert len(calls) == sum(1 for curve in COVERAGES.values() if curve)
+
+
+def test_allocation_is_written_with_exclusions_of_allocated_boundaries(tmp_path):
+    curves = make_curves()
+    counts = allocate_budget(curves, 3)
+    write_allocation(str(tmp_path), curves, counts)
+
+    with open(tmp_path / 'allocated_bubbles.csv') as f:
+        rows = list(csv.DictReader(f))
+    allocated = {name for name, count in counts.items() if count}
+    assert sum(row['type'] == 'inclusion' for row in rows) == 3
+    assert {row['name'] for row in rows if row['type'] == 'exclusion'} == allocated
+
+
+def test_curves_round_trip(tmp_path):
+    curves = make_curves()
+    curves_path = tmp_path / 'curves.csv'
+    with open(curves_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(allocation.CURVE_FIELDS)
+        for name, curve in curves.items():
+            # Written out of rank order, as the ranks alone give the order
+            for rank, (bubble, coverage) in reversed(list(enumerate(curve['inclusion']))):
+                writer.writerow([name, 'inclusion', rank, bubble, coverage])
+            for bubble in curve['exclusion']:
+                writer.writerow([name, 'exclusion', '', bubble, ''])
+    assert read_curves(curves_path) == {name: curve for name, curve in curves.items() if curve['inclusion']}
+
+
+def test_meta_upload_targets_exclusions_as_excluded_locations(tmp_path, monkeypatch):
+    meta_upload = pytest.importorskip('meta_upload')
+    curves = make_curves()
+    write_allocation(str(tmp_path), curves, allocate_budget(curves, 3))
+
+    locations, excluded_locations = meta_upload.parse_bubbles(str(tmp_path / 'allocated_bubbles.csv'))
+    assert set(locations) == set(excluded_locations) == {'Steep', 'Single'}
+
+    ad_sets = []
+
+    class Account:
+        def create_campaign(self, params):
+            return {'id': 'campaign'}
+
+        def create_ad_set(self, params):
+            ad_sets.append(params)
+            return {'id': params['name']}
+
+    monkeypatch.setattr(meta_upload, 'init_ad_account', Account)
+    meta_upload.create_ad_sets_with_geo_targeting(locations, excluded_locations)
+
+    targeting = {ad_set['name']: ad_set['targeting'] for ad_set in ad_sets}
+    steep = targeting['Steep Geofence']
+    assert len(steep['geo_locations']['custom_locations']) == 2
+    assert steep['excluded_geo_locations']['custom_locations'] == [
+        {'latitude': 52.0, 'longitude': -1.5, 'radius': 1.0, 'distance_unit': 'kilometer'}
+    ]
+    assert 'excluded_geo_locations' in targeting['Single Geofence']
@@ -0,0 +1,30 @@
+import csv
+import io
+
+import pytest
+
+from analysis import SummaryStatistics
+
+
+def write_summary(summary):
+    output = io.StringIO()
+    summary.write(csv.writer(output))
+    return {row[0]: row[1] for row in csv.reader(io.StringIO(output.getvalue())) if row[0]}
+
+
+def test_summary_of_no_boundaries_is_blank():
+    rows = write_summary(SummaryStatistics())
+    assert len(rows) == 20
+    assert set(rows.values()) == {''}
+
+
+def test_summary_statistics():
+    summary = SummaryStatistics()
+    for net in (50, 70, 90):
+        summary.add({'internal_inclusion': net, 'external_inclusion': 1, 'exclusion': 0, 'net': net})
+    rows = write_summary(summary)
+    assert float(rows['net_mean']) == pytest.approx(70)
+    assert float(rows['net_median']) == pytest.approx(70)
+    assert float(rows['net_min']) == 50
+    assert float(rows['net_max']) == 90
+    assert float(rows['exclusion_sigma']) == 0
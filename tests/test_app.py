@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app as bubble_app
+
+# About 3km by 3km near Wolverhampton
+SQUARE = {
+    'type': 'Polygon',
+    'coordinates': [[[-2.15, 52.60], [-2.11, 52.60], [-2.11, 52.627], [-2.15, 52.627], [-2.15, 52.60]]],
+}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(bubble_app, 'executor', executor)
+    monkeypatch.setattr(bubble_app, 'result_cache', bubble_app.OrderedDict())
+    monkeypatch.setattr(bubble_app, 'preloaded_boundaries', {})
+    yield bubble_app.app.test_client()
+    executor.shutdown()
+
+
+def test_request_is_generated_then_served_from_cache(client):
+    response = client.post('/bubbles', json={'geometry': SQUARE})
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['status'] == 'finished'
+    assert not result['cached']
+    assert {bubble['type'] for bubble in result['bubbles']} == {'inclusion', 'exclusion'}
+    assert 0 < result['coverage']['net'] <= 100
+
+    # The same area as a Feature with the default options written out is the same request
+    response = client.post('/bubbles', json={
+        'geometry': {'type': 'Feature', 'properties': {}, 'geometry': SQUARE},
+        'options': {'time_budget': bubble_app.DEFAULT_TIME_BUDGET},
+    })
+    cached = response.get_json()
+    assert cached['cached']
+    assert cached['key'] == result['key']
+    assert cached['bubbles'] == result['bubbles']
+
+
+def test_cut_off_result_is_not_cached(client):
+    request = {'geometry': SQUARE, 'options': {'time_budget': 1e-9}}
+    first = client.post('/bubbles', json=request).get_json()
+    assert first['status'] == 'cut_off'
+    second = client.post('/bubbles', json=request).get_json()
+    assert not second['cached']
+    assert not bubble_app.result_cache
+
+
+@pytest.mark.parametrize('body', [
+    [1, 2],
+    {},
+    {'geometry': {'type': 'Point', 'coordinates': [-2.1, 52.6]}},
+    {'geometry': {'type': 'Polygon'}},
+    {'geometry': SQUARE, 'options': {'time_budget': -1}},
+    {'geometry': SQUARE, 'options': {'time_budget': 'nan'}},
+    {'geometry': SQUARE, 'options': {'time_budget': 'soon'}},
+])
+def test_invalid_request_is_rejected(client, body):
+    response = client.post('/bubbles', json=body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_area_over_limit_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(bubble_app, 'max_area_km2', 1)
+    response = client.post('/bubbles', json={'geometry': SQUARE})
+    assert response.status_code == 400
+    assert 'km²' in response.get_json()['error']
+
+
+def test_time_budget_is_capped(client, monkeypatch):
+    monkeypatch.setattr(bubble_app, 'max_time_budget', 5)
+    assert bubble_app.parse_request_options({'options': {'time_budget': 1000}})['time_budget'] == 5
+
+
+def test_boundary_names_need_preload(client):
+    response = client.post('/bubbles', json={'boundaries': ['Aldershot']})
+    assert response.status_code == 400
+    assert '--preload' in response.get_json()['error']
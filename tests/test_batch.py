@@ -0,0 +1,26 @@
+"""The batch engine must give the same bubbles and statistics as processing each boundary in turn."""
+
+import numpy as np
+import pytest
+
+from analysis import compute_coverage_stats
+from batch import calculate_bubbles_batch, compute_coverage_stats_batch
+from bubble_generation import calculate_bubbles_with_exclusions
+
+
+def test_batch_matches_per_boundary_path(fixture_boundaries):
+    boundaries = [boundary for _, boundary in fixture_boundaries]
+    batch_results = calculate_bubbles_batch(boundaries)
+    batch_statistics = compute_coverage_stats_batch(
+        boundaries,
+        [inclusion_bubbles for inclusion_bubbles, _, _, _ in batch_results],
+        [exclusion_bubbles for _, _, exclusion_bubbles, _ in batch_results]
+    )
+
+    for (name, boundary), batch_result, batch_stats in zip(fixture_boundaries, batch_results, batch_statistics):
+        inclusion_bubbles, inclusion_data, exclusion_bubbles, exclusion_data = calculate_bubbles_with_exclusions(boundary)
+        stats = compute_coverage_stats(boundary, inclusion_bubbles, exclusion_bubbles)
+
+        np.testing.assert_allclose(batch_result[1], inclusion_data, err_msg=name)
+        np.testing.assert_allclose(batch_result[3], exclusion_data, err_msg=name)
+        assert batch_stats == pytest.approx(stats), name
@@ -0,0 +1,40 @@
+import pytest
+
+import boundaries
+
+
+@pytest.fixture
+def mirror(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv('BOUNDARY_ALLOW_UNVERIFIED', raising=False)
+    mirror = tmp_path / 'mirror'
+    mirror.mkdir()
+    (mirror / 'test.gpkg').write_bytes(b'first release')
+    return mirror
+
+
+def test_first_download_records_its_checksum_and_later_ones_are_checked(mirror):
+    boundaries.download_to_file('https://example.com/test.gpkg', 'wards/test.gpkg', mirror=str(mirror))
+    assert 'test.gpkg' in boundaries.read_recorded_checksums()
+
+    (mirror / 'test.gpkg').write_bytes(b'tampered')
+    with pytest.raises(ValueError):
+        boundaries.stream_download('https://example.com/test.gpkg', 'data/wards/test.gpkg', mirror=str(mirror))
+    assert (mirror.parent / 'data' / 'wards' / 'test.gpkg').read_bytes() == b'first release'
+
+
+def test_republished_download_is_accepted_when_allowed(mirror):
+    boundaries.download_to_file('https://example.com/test.gpkg', 'wards/test.gpkg', mirror=str(mirror))
+    (mirror / 'test.gpkg').write_bytes(b'second release')
+    boundaries.stream_download(
+        'https://example.com/test.gpkg', 'data/wards/test.gpkg', mirror=str(mirror), allow_unverified=True
+    )
+    assert boundaries.read_recorded_checksums()['test.gpkg'] == boundaries.sha256_of('data/wards/test.gpkg')
+
+
+def test_pinned_checksum_is_enforced(mirror):
+    with pytest.raises(ValueError):
+        boundaries.download_to_file(
+            'https://example.com/test.gpkg', 'wards/test.gpkg', expected_sha256='0' * 64, mirror=str(mirror),
+            allow_unverified=True
+        )
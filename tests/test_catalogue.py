@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+import catalogue
+from boundaries import wards_shapefile_filename
+from test_work_queue import run_main, write_wards
+
+WARDS_PATH = 'wards/' + wards_shapefile_filename
+SOURCES = [(WARDS_PATH, 'WD25CD', 'WD25NM')]
+
+
+class RecordingCollection:
+    """Wraps an open boundary file, recording which features are read from it."""
+
+    def __init__(self, collection, read_fids):
+        self.collection = collection
+        self.read_fids = read_fids
+
+    def __getitem__(self, fid):
+        self.read_fids.append(fid)
+        return self.collection[fid]
+
+    def __iter__(self):
+        raise AssertionError('the whole boundary file was read')
+
+    def close(self):
+        self.collection.close()
+
+
+@pytest.fixture
+def wards(tmp_path, monkeypatch, fixture_boundaries):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('mirror')
+    write_wards(os.path.join('mirror', wards_shapefile_filename), fixture_boundaries)
+    os.makedirs('data/wards')
+    write_wards(os.path.join('data', WARDS_PATH), fixture_boundaries)
+    return fixture_boundaries
+
+
+def test_catalogue_is_rebuilt_when_source_is_newer(wards):
+    entries = catalogue.get_catalogue(SOURCES)
+    assert [entry['name'].split(' ', 1)[1] for entry in entries] == [name for name, _ in wards]
+
+    write_wards(os.path.join('data', WARDS_PATH), wards[:2])
+    catalogue_path = catalogue.get_catalogue_path(WARDS_PATH)
+    source_time = os.path.getmtime(os.path.join('data', WARDS_PATH))
+    os.utime(catalogue_path, (source_time - 10, source_time - 10))
+    assert len(catalogue.get_catalogue(SOURCES)) == 2
+
+
+def test_catalogue_is_reused_when_up_to_date(wards, monkeypatch):
+    catalogue.get_catalogue(SOURCES)
+    monkeypatch.setattr(catalogue, 'build_catalogue', lambda *args: pytest.fail('catalogue was rebuilt'))
+    assert len(catalogue.get_catalogue(SOURCES)) == len(wards)
+
+
+def test_region_selection_loads_only_matching_features(wards, monkeypatch):
+    entries = catalogue.get_catalogue(SOURCES)
+    read_fids = []
+    open_file = catalogue.fiona.open
+    monkeypatch.setattr(catalogue.fiona, 'open', lambda path: RecordingCollection(open_file(path), read_fids))
+
+    run_main(monkeypatch, '--region', '*Sliver')
+
+    sliver = next(entry for entry in entries if entry['name'].endswith('Sliver'))
+    assert read_fids == [sliver['fid']]
+    assert os.listdir('output/wards/CSVs') == [sliver['name'] + '.csv']
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+import shapely
+from shapely.geometry import GeometryCollection, LineString, MultiPolygon, box
+
+from circle_union import compute_exact_coverage_stats
+
+
+def test_polygons_nested_in_a_geometry_collection_are_kept():
+    islands = MultiPolygon([box(0, 0, 4000, 3000), box(5000, 0, 7500, 2500)])
+    # make_valid returns this shape for, e.g., two islands joined by a zero-width spike
+    collection = GeometryCollection([islands, LineString([(4000, 1000), (5000, 1000)])])
+    # Circles crossing the islands' outlines, so the outline segments are needed to measure coverage
+    circles = np.array([[3500.0, 1500.0, 2000.0], [7000.0, 1250.0, 1000.0]])
+
+    covered = shapely.union_all(shapely.buffer(shapely.points(circles[:, :2]), circles[:, 2], quad_segs=256))
+    expected = 100 * covered.intersection(islands).area / islands.area
+    assert compute_exact_coverage_stats(islands, circles, np.empty((0, 3)))['net'] == pytest.approx(expected, abs=0.01)
+    assert compute_exact_coverage_stats(collection, circles, np.empty((0, 3)))['net'] == pytest.approx(expected, abs=0.01)
+
+
+def buffered_coverage(boundary, inclusion_circles, exclusion_circles):
+    def union(circles):
+        return shapely.union_all(shapely.buffer(shapely.points(circles[:, :2]), circles[:, 2], quad_segs=512))
+
+    included = union(inclusion_circles).intersection(boundary)
+    if len(exclusion_circles):
+        included = included.difference(union(exclusion_circles))
+    return 100 * included.area / boundary.area
+
+
+@pytest.mark.parametrize('inclusion_circles, exclusion_circles', [
+    # Internally tangent: the smaller circle touches the larger one from inside
+    ([[0, 0, 3000], [1000, 0, 2000]], []),
+    # Externally tangent
+    ([[0, 0, 3000], [5000, 0, 2000]], []),
+    # The same circle twice
+    ([[0, 0, 3000], [0, 0, 3000]], []),
+    # Four circles crossing at one point, with centres rounded to whole metres as written to the CSVs
+    ([[1414, 1414, 2000], [-1414, 1414, 2000], [-1414, -1414, 2000], [1414, -1414, 2000]], []),
+    ([[1000, 0, 1000], [-1000, 0, 1000], [0, 1000, 1000], [0, -1000, 1000]], [[0, 0, 1000]]),
+    # Circles tangent to the boundary's edges, and crossing it at its corners
+    ([[2000, -1000, 3000], [2000, 3000, 3000]], []),
+    ([[5000, 5000, 2000], [-3000, 3000, 2000]], []),
+])
+def test_degenerate_circles_match_buffered_coverage(inclusion_circles, exclusion_circles):
+    boundary = box(-5000, -5000, 5000, 5000)
+    inclusion_circles = np.array(inclusion_circles, dtype=float)
+    exclusion_circles = np.array(exclusion_circles, dtype=float).reshape(-1, 3)
+    expected = buffered_coverage(boundary, inclusion_circles, exclusion_circles)
+    stats = compute_exact_coverage_stats(boundary, inclusion_circles, exclusion_circles)
+    assert stats['net'] == pytest.approx(expected, abs=0.01)
+
+
+def test_exclusion_identical_to_inclusion_leaves_nothing_covered():
+    circles = np.array([[0.0, 0.0, 3000.0]])
+    stats = compute_exact_coverage_stats(box(-5000, -5000, 5000, 5000), circles, circles)
+    assert stats['net'] == pytest.approx(0, abs=1e-6)
+    assert stats['exclusion'] == pytest.approx(100 * np.pi * 3000 ** 2 / 1e8)
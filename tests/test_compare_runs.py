@@ -0,0 +1,19 @@
+from compare_runs import bubbles_match, parse_bubble
+
+
+def test_bubbles_match_allows_position_jitter():
+    baseline = [parse_bubble('(51.5, -0.1) +2km'), parse_bubble('(51.6, -0.2) +1km')]
+    jittered = [parse_bubble('(51.6000000001, -0.2) +1km'), parse_bubble('(51.5, -0.0999999999) +2km')]
+    assert bubbles_match(sorted(baseline), sorted(jittered), 1e-6)
+
+
+def test_bubbles_match_detects_moves_and_radius_changes():
+    baseline = [parse_bubble('(51.5, -0.1) +2km')]
+    assert not bubbles_match(baseline, [parse_bubble('(51.5001, -0.1) +2km')], 1e-6)
+    assert not bubbles_match(baseline, [parse_bubble('(51.5, -0.1) +3km')], 1e-6)
+    assert not bubbles_match(baseline, baseline * 2, 1e-6)
+
+
+def test_radii_in_km_and_meters_are_compared_in_meters():
+    assert parse_bubble('(51.5, -0.1) +2km') == parse_bubble('(51.5, -0.1) +2000m') == (51.5, -0.1, 2000)
+    assert parse_bubble('(51.5, -0.1) +1513m')[2] == 1513
@@ -0,0 +1,87 @@
+import csv
+import os
+import shutil
+
+import main
+from boundaries import wards_shapefile_filename
+from bubble_generation import Deadline, calculate_bubbles_with_exclusions
+from test_work_queue import run_main, write_wards
+
+CHECKS_ALLOWED = 3
+
+
+class CountingDeadline(Deadline):
+    """A deadline that passes after a fixed number of checks, so cut-offs don't depend on machine speed."""
+
+    def __init__(self, seconds=None):
+        super().__init__(seconds)
+        self.checks = 0
+
+    def expired(self):
+        self.checks += 1
+        if self.expires_at is not None and self.checks > CHECKS_ALLOWED:
+            self.reached = True
+        return self.reached
+
+
+def read_statuses(output_directory):
+    with open(os.path.join(output_directory, 'statistics.csv')) as f:
+        return {row['name']: row['status'] for row in csv.DictReader(f) if row['name'] and row['net_coverage']}
+
+
+def read_inclusion_counts(output_directory):
+    counts = {}
+    with open(os.path.join(output_directory, 'bubbles.csv')) as f:
+        for row in csv.DictReader(f):
+            if row['type'] == 'inclusion':
+                counts[row['name']] = counts.get(row['name'], 0) + 1
+    return counts
+
+
+def test_deadline_without_limit_never_expires():
+    deadline = Deadline()
+    assert not deadline.expired()
+    assert not deadline.reached
+
+
+def test_expired_deadline_is_remembered():
+    deadline = Deadline(0)
+    assert deadline.expired()
+    assert deadline.reached
+
+
+def test_expired_deadline_keeps_partial_results(fixture_boundaries):
+    boundary = fixture_boundaries[0][1]
+    full_inclusion, _, full_exclusion, _ = calculate_bubbles_with_exclusions(boundary)
+
+    deadline = CountingDeadline(60)
+    inclusion_bubbles, _, exclusion_bubbles, _ = calculate_bubbles_with_exclusions(boundary, deadline=deadline)
+
+    assert deadline.reached
+    assert 0 < len(inclusion_bubbles) < len(full_inclusion)
+    assert len(exclusion_bubbles) == len(full_exclusion)
+
+
+def test_cut_off_status_survives_queue_and_merge(tmp_path, monkeypatch, fixture_boundaries):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, 'Deadline', CountingDeadline)
+    os.makedirs('mirror')
+    write_wards(os.path.join('mirror', wards_shapefile_filename), fixture_boundaries)
+
+    run_main(monkeypatch)
+    shutil.move('output/wards', 'unlimited')
+    run_main(monkeypatch, '--time-budget', '60')
+    shutil.move('output/wards', 'single_node')
+    run_main(monkeypatch, '--queue', 'queue.db', '--time-budget', '60')
+    run_main(monkeypatch, '--queue', 'queue.db', '--role', 'worker', '--worker-id', 'first')
+    run_main(monkeypatch, '--queue', 'queue.db', '--role', 'merge')
+
+    assert set(read_statuses('unlimited').values()) == {'finished'}
+    statuses = read_statuses('single_node')
+    assert 'cut_off' in statuses.values()
+    assert read_statuses('output/wards') == statuses
+
+    unlimited_counts = read_inclusion_counts('unlimited')
+    for name, count in read_inclusion_counts('output/wards').items():
+        if statuses[name] == 'cut_off':
+            assert 0 < count < unlimited_counts[name]
@@ -0,0 +1,19 @@
+import numpy as np
+
+from distance_field import squared_distance_transform
+
+
+def brute_force_squared_distance(inside):
+    outside_rows, outside_columns = np.nonzero(~inside)
+    rows, columns = np.indices(inside.shape)
+    squared = ((rows[..., None] - outside_rows) ** 2 + (columns[..., None] - outside_columns) ** 2).min(axis=-1)
+    return np.where(inside, squared, 0).astype(float)
+
+
+def test_squared_distance_transform_is_exact():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        rows, columns = rng.integers(2, 30, 2)
+        inside = np.repeat(np.repeat(rng.random((rows // 3 + 1, columns // 3 + 1)) < 0.7, 3, 0), 3, 1)[:rows, :columns]
+        inside[0] = False
+        np.testing.assert_array_equal(squared_distance_transform(inside), brute_force_squared_distance(inside))
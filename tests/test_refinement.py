@@ -0,0 +1,30 @@
+import pytest
+
+from analysis import compute_coverage_stats
+from bubble_generation import calculate_bubbles_with_exclusions
+from refinement import refine_bubbles
+
+# Refinement judges coverage on grid samples, so it may lose this many percentage points of net coverage
+COVERAGE_TOLERANCE = 0.1
+
+
+@pytest.mark.parametrize('index', range(4))
+def test_refinement_uses_fewer_bubbles_without_losing_coverage(fixture_boundaries, index):
+    _, boundary = fixture_boundaries[index]
+    padded_boundary = boundary.buffer(500)
+    inclusion_bubbles, inclusion_data, exclusion_bubbles, _ = calculate_bubbles_with_exclusions(boundary)
+    before = compute_coverage_stats(boundary, inclusion_bubbles, exclusion_bubbles)['net']
+
+    refined_bubbles, refined_data = refine_bubbles(
+        boundary, padded_boundary, inclusion_bubbles, inclusion_data, exclusion_bubbles
+    )
+    after = compute_coverage_stats(boundary, refined_bubbles, exclusion_bubbles)['net']
+
+    assert len(refined_bubbles) == len(refined_data) <= len(inclusion_bubbles)
+    if len(inclusion_bubbles) > 1:
+        assert len(refined_bubbles) < len(inclusion_bubbles)
+    assert after >= before - COVERAGE_TOLERANCE
+    for bubble, (_, _, radius) in zip(refined_bubbles, refined_data):
+        if len(inclusion_bubbles) > 1:
+            assert padded_boundary.buffer(1).contains(bubble)
+            assert radius == int(radius)
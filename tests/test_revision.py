@@ -0,0 +1,48 @@
+import csv
+
+import numpy as np
+import pyproj
+import pytest
+import shapely
+from shapely.geometry import box
+
+from bubble_generation import create_minimum_bounding_circle
+from main import format_bubble
+from revision import PreviousRun, revise_exclusion_bubbles
+
+
+def test_previous_circles_read_fallback_radius_in_meters(tmp_path):
+    transformer = pyproj.Transformer.from_crs('epsg:27700', 'epsg:4326')
+    # Too thin for a 1km bubble, so its only inclusion bubble is the minimum bounding circle
+    _, fallback = create_minimum_bounding_circle(box(380000, 300000, 383000, 300400))
+    with open(tmp_path / 'statistics.csv', 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['name', 'net_coverage'])
+        writer.writerow(['Sliver', '0'])
+    with open(tmp_path / 'bubbles.csv', 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['bubble', 'name', 'type'])
+        writer.writerow([format_bubble(transformer, *fallback), 'Sliver', 'inclusion'])
+        writer.writerow([format_bubble(transformer, 381000, 301500, 1000), 'Sliver', 'exclusion'])
+        # Written in km by runs from before radii were written in meters
+        writer.writerow(['(52.6, -2.1) +2km', 'Old', 'inclusion'])
+    previous = PreviousRun(str(tmp_path), [])
+
+    inclusion = previous.circles('Sliver', 'inclusion')
+    assert inclusion[0, :2] == pytest.approx(fallback[:2], abs=0.01)
+    assert inclusion[0, 2] == fallback[2] == 1513
+    assert previous.circles('Sliver', 'exclusion')[0, 2] == 1000
+    assert previous.circles('Old', 'inclusion')[0, 2] == 2000
+
+
+def test_revised_exclusion_bubbles_skip_holes():
+    boundary = shapely.difference(box(0, 0, 20000, 20000), box(6000, 6000, 14000, 14000))
+    hole_edge = shapely.LineString([(14000, 8000), (14000, 12000)])
+    outer_edge = shapely.LineString([(20000, 8000), (20000, 12000)])
+
+    _, placed = revise_exclusion_bubbles(boundary, hole_edge, np.empty((0, 3)))
+    assert len(placed) == 0
+
+    _, placed = revise_exclusion_bubbles(boundary, outer_edge, np.empty((0, 3)))
+    assert len(placed) > 0
+    assert np.all(placed[:, 0] == pytest.approx(21000))
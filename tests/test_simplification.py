@@ -0,0 +1,31 @@
+import csv
+import os
+import shutil
+
+import pytest
+
+from boundaries import wards_shapefile_filename
+from test_work_queue import run_main, write_wards
+
+
+def read_exclusion_coverage(output_directory):
+    with open(os.path.join(output_directory, 'statistics.csv')) as f:
+        return {row['name']: float(row['exclusion_coverage']) for row in csv.DictReader(f) if row['name'] and row['net_coverage']}
+
+
+def test_exclusion_bubbles_stay_clear_of_unsimplified_boundary(tmp_path, monkeypatch, fixture_boundaries):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('mirror')
+    write_wards(os.path.join('mirror', wards_shapefile_filename), fixture_boundaries)
+
+    run_main(monkeypatch)
+    shutil.move('output/wards', 'unsimplified')
+    unsimplified = read_exclusion_coverage('unsimplified')
+    assert len(unsimplified) == len(fixture_boundaries)
+
+    for tolerance in ('300', '500'):
+        run_main(monkeypatch, '--simplify', tolerance)
+        for name, exclusion_coverage in read_exclusion_coverage('output/wards').items():
+            # Only the slivers between the 64-sided bubbles and the true 1km buffer, as without simplifying
+            assert exclusion_coverage == pytest.approx(unsimplified[name], abs=1e-9), (tolerance, name)
+            assert exclusion_coverage < 1e-3
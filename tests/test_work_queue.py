@@ -0,0 +1,112 @@
+"""Work queue leasing, and the queued run's output matching a single-node run."""
+
+import csv
+import filecmp
+import os
+import shutil
+import sys
+import time
+
+import fiona
+import pytest
+from shapely.geometry import MultiPolygon, mapping
+
+import main
+import work_queue
+from boundaries import wards_shapefile_filename
+
+ENTRIES = [{'source': 'wards/test.gpkg', 'fid': fid, 'name': f'Ward {fid}', 'code': '', 'bounds': [0, 0, 1, 1]} for fid in (1, 2)]
+SETTINGS = {'use_wards': True, 'simplify': 0, 'distance_field': False, 'time_budget': None, 'refine': False}
+
+
+@pytest.fixture
+def connection(tmp_path):
+    connection = work_queue.connect(str(tmp_path / 'queue.db'))
+    yield connection
+    connection.close()
+
+
+def test_queue_uses_rollback_journal(connection):
+    assert connection.execute('PRAGMA journal_mode').fetchone()[0] == 'delete'
+
+
+def test_rerunning_coordinator_with_other_settings_is_refused(connection):
+    work_queue.enqueue_jobs(connection, ENTRIES, SETTINGS)
+    work_queue.enqueue_jobs(connection, ENTRIES, SETTINGS)
+    with pytest.raises(ValueError):
+        work_queue.enqueue_jobs(connection, ENTRIES, {**SETTINGS, 'refine': True})
+    with pytest.raises(ValueError):
+        work_queue.enqueue_jobs(connection, ENTRIES[:1], SETTINGS)
+    assert work_queue.get_job_counts(connection) == {'pending': 2}
+
+
+def test_expired_job_out_of_attempts_is_failed(connection):
+    work_queue.enqueue_jobs(connection, ENTRIES[:1], SETTINGS)
+    for attempt in range(work_queue.MAX_ATTEMPTS):
+        assert work_queue.claim_job(connection, f'worker-{attempt}', lease_seconds=0) is not None
+        time.sleep(0.01)
+    assert work_queue.claim_job(connection, 'worker-last', lease_seconds=0) is None
+    assert work_queue.get_job_counts(connection) == {'failed': 1}
+    with pytest.raises(ValueError):
+        list(work_queue.get_results(connection))
+
+
+def test_heartbeat_keeps_lease(tmp_path, connection):
+    work_queue.enqueue_jobs(connection, ENTRIES[:1], SETTINGS)
+    position, _ = work_queue.claim_job(connection, 'slow-worker', lease_seconds=0.3)
+    with work_queue.LeaseHeartbeat(str(tmp_path / 'queue.db'), position, 'slow-worker', 0.3):
+        time.sleep(1)
+        assert work_queue.claim_job(connection, 'other-worker', lease_seconds=0.3) is None
+    assert work_queue.complete_job(connection, position, 'slow-worker', {})
+
+
+def test_merging_empty_queue_writes_blank_summary(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    connection = work_queue.connect('queue.db')
+    work_queue.enqueue_jobs(connection, [], SETTINGS)
+    connection.close()
+
+    main.merge_queue_results('queue.db')
+
+    with open('output/wards/statistics.csv') as f:
+        rows = list(csv.DictReader(f))
+    assert rows and all(not row['net_coverage'] for row in rows)
+
+
+def write_wards(path, boundaries):
+    """Writes fixture boundaries as a wards GeoPackage with the fields the real file has."""
+    schema = {'geometry': 'MultiPolygon', 'properties': {'WD25CD': 'str', 'WD25NM': 'str'}}
+    with fiona.open(path, 'w', driver='GPKG', schema=schema, crs='EPSG:27700') as wards_file:
+        for index, (name, boundary) in enumerate(boundaries):
+            polygons = boundary if isinstance(boundary, MultiPolygon) else MultiPolygon([boundary])
+            wards_file.write({'geometry': mapping(polygons), 'properties': {'WD25CD': f'E05{index:06d}', 'WD25NM': name}})
+
+
+def run_main(monkeypatch, *args):
+    monkeypatch.setattr(sys, 'argv', ['main.py', '--wards', '--mirror', 'mirror', '--allow-unverified-downloads', *args])
+    main.main()
+
+
+def without_runtimes(statistics_path):
+    """Reads statistics.csv without its runtime_seconds column, the one column expected to differ between runs."""
+    with open(statistics_path) as f:
+        return [row[:6] for row in csv.reader(f)]
+
+
+def test_queued_run_matches_single_node_run(tmp_path, monkeypatch, fixture_boundaries):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('mirror')
+    write_wards(os.path.join('mirror', wards_shapefile_filename), fixture_boundaries)
+
+    run_main(monkeypatch)
+    shutil.move('output/wards', 'single_node')
+
+    run_main(monkeypatch, '--queue', 'queue.db')
+    run_main(monkeypatch, '--queue', 'queue.db', '--role', 'worker', '--worker-id', 'first')
+    run_main(monkeypatch, '--queue', 'queue.db', '--role', 'merge')
+
+    assert filecmp.cmp('single_node/bubbles.csv', 'output/wards/bubbles.csv', shallow=False)
+    assert without_runtimes('single_node/statistics.csv') == without_runtimes('output/wards/statistics.csv')
+    csv_names = sorted(os.listdir('single_node/CSVs'))
+    assert len(csv_names) == len(fixture_boundaries)
+    assert filecmp.cmpfiles('single_node/CSVs', 'output/wards/CSVs', csv_names, shallow=False)[0] == csv_names
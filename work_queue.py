@@ -0,0 +1,307 @@
+"""SQLite-backed work queue so several machines sharing storage can process boundaries together."""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+DEFAULT_LEASE_SECONDS = 15 * 60
+MAX_ATTEMPTS = 3
+
+
+def connect(queue_path):
+    """
+    Opens a connection to a queue database, creating its tables if needed.
+
+    The default rollback journal is used rather than WAL, which relies on shared memory and does
+    not work when the database is on a network filesystem shared between machines.
+
+    Args:
+        queue_path (str): Path to the SQLite database on shared storage
+
+    Returns:
+        sqlite3.Connection: The open connection
+    """
+    connection = sqlite3.connect(queue_path, timeout=60, isolation_level=None)
+    connection.execute('PRAGMA journal_mode=DELETE')
+    connection.execute('CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)')
+    connection.execute(
+        '''CREATE TABLE IF NOT EXISTS jobs (
+            position INTEGER PRIMARY KEY,
+            entry TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            worker TEXT,
+            lease_expires REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            result TEXT,
+            error TEXT
+        )'''
+    )
+    return connection
+
+
+def default_worker_id():
+    """
+    Returns an identifier for this worker process that is unique across machines.
+
+    Returns:
+        str: Host name and process id
+    """
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+def enqueue_jobs(connection, entries, settings):
+    """
+    Queues one job per catalogue entry, in order, along with the settings every worker must use.
+
+    Re-running the coordinator with the same selection and settings leaves the queue as it is, so
+    finished jobs are kept. A queue made with a different selection or different settings is refused
+    rather than mixing two runs' jobs.
+
+    Args:
+        connection (sqlite3.Connection): Queue connection
+        entries (list): Catalogue entries to process
+        settings (dict): Run settings, e.g. whether to use wards and which placement options are enabled
+
+    Raises:
+        ValueError: If the queue already holds jobs for a different selection or different settings
+    """
+    encoded_settings = {key: json.dumps(value) for key, value in settings.items()}
+    encoded_entries = [json.dumps(entry) for entry in entries]
+
+    connection.execute('BEGIN IMMEDIATE')
+    queued_settings = dict(connection.execute('SELECT key, value FROM settings'))
+    queued_entries = [entry for (entry,) in connection.execute('SELECT entry FROM jobs ORDER BY position')]
+    if queued_settings or queued_entries:
+        connection.execute('ROLLBACK')
+        if queued_settings != encoded_settings or queued_entries != encoded_entries:
+            raise ValueError(
+                'The queue already holds jobs for a different selection or different settings; '
+                'use a new queue file for this run'
+            )
+        print(f'Queue already holds these {len(entries)} jobs: {get_job_counts(connection)}')
+        return
+
+    connection.executemany('INSERT INTO settings (key, value) VALUES (?, ?)', encoded_settings.items())
+    connection.executemany(
+        'INSERT INTO jobs (position, entry) VALUES (?, ?)', enumerate(encoded_entries)
+    )
+    connection.execute('COMMIT')
+    print(f'Queued {len(entries)} jobs')
+
+
+def get_settings(connection):
+    """
+    Reads the run settings stored by the coordinator.
+
+    Args:
+        connection (sqlite3.Connection): Queue connection
+
+    Returns:
+        dict: Run settings
+    """
+    return {key: json.loads(value) for key, value in connection.execute('SELECT key, value FROM settings')}
+
+
+def fail_expired_jobs(connection, now):
+    """
+    Marks running jobs as failed once their lease has expired and they have used all their attempts.
+
+    Their workers died on every attempt, so nothing would ever claim them again.
+
+    Args:
+        connection (sqlite3.Connection): Queue connection
+        now (float): Current time, as from time.time()
+    """
+    connection.execute(
+        '''UPDATE jobs SET status = 'failed', error = COALESCE(error, 'lease expired'), lease_expires = NULL
+           WHERE status = 'running' AND lease_expires < ? AND attempts >= ?''',
+        (now, MAX_ATTEMPTS),
+    )
+
+
+def claim_job(connection, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    Claims the next pending job, or a running job whose lease has expired because its worker died.
+
+    Args:
+        connection (sqlite3.Connection): Queue connection
+        worker_id (str): Identifier of the claiming worker
+        lease_seconds (float): How long the job is reserved for this worker
+
+    Returns:
+        tuple: (position, catalogue entry), or None if there is nothing left to claim
+    """
+    now = time.time()
+    connection.execute('BEGIN IMMEDIATE')
+    fail_expired_jobs(connection, now)
+    row = connection.execute(
+        '''SELECT position, entry FROM jobs
+           WHERE attempts < ? AND (status = 'pending' OR (status = 'running' AND lease_expires < ?))
+           ORDER BY position LIMIT 1''',
+        (MAX_ATTEMPTS, now),
+    ).fetchone()
+    if row is None:
+        connection.execute('COMMIT')
+        return None
+
+    position, entry = row
+    connection.execute(
+        '''UPDATE jobs SET status = 'running', worker = ?, lease_expires = ?, attempts = attempts + 1
+           WHERE position = ?''',
+        (worker_id, now + lease_seconds, position),
+    )
+    connection.execute('COMMIT')
+    return position, json.loads(entry)
+
+
+def renew_lease(connection, position, worker_id, lease_seconds):
+    """
+    Extends a running job's lease, as long as the worker still holds it.
+
+    Args:
+        connection (sqlite3.Connection): Queue connection
+        position (int): Position of the job
+        worker_id (str): Identifier of the worker running the job
+        lease_seconds (float): How long from now the job stays reserved
+
+    Returns:
+        bool: False if the lease had already been taken over by another worker
+    """
+    cursor = connection.execute(
+        '''UPDATE jobs SET lease_expires = ?
+           WHERE position = ? AND worker = ? AND status = 'running' ''',
+        (time.time() + lease_seconds, position, worker_id),
+    )
+    return cursor.rowcount == 1
+
+
+class LeaseHeartbeat:
+    """
+    Renews a job's lease in the background while it runs, so a boundary that takes longer than the
+    lease isn't claimed and run a second time by another worker. The lease still expires soon after
+    the worker process dies.
+
+    Used as a context manager around processing the job.
+    """
+
+    def __init__(self, queue_path, position, worker_id, lease_seconds):
+        """
+        Args:
+            queue_path (str): Path to the queue database
+            position (int): Position of the claimed job
+            worker_id (str): Identifier of the worker running the job
+            lease_seconds (float): Lease length; it is renewed every third of this
+        """
+        self.queue_path = queue_path
+        self.position = position
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        # sqlite3 connections can't be shared between threads, so the heartbeat opens its own
+        connection = connect(self.queue_path)
+        try:
+            while not self.stopped.wait(self.lease_seconds / 3):
+                if not renew_lease(connection, self.position, self.worker_id, self.lease_seconds):
+                    break
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+def complete_job(connection, position, worker_id, result):
+    """
+    Stores a job's result, as long as the worker still holds its lease.
+
+    Args:
+        connection (sqlite3.Connection): Queue connection
+        position (int): Position of the job
+        worker_id (str): Identifier of the worker that ran the job
+        result (dict): JSON-serialisable result
+
+    Returns:
+        bool: False if the lease had been taken over by another worker and the result was discarded
+    """
+    cursor = connection.execute(
+        '''UPDATE jobs SET status = 'done', result = ?, error = NULL
+           WHERE position = ? AND worker = ? AND status = 'running' ''',
+        (json.dumps(result), position, worker_id),
+    )
+    return cursor.rowcount == 1
+
+
+def fail_job(connection, position, worker_id, error):
+    """
+    Releases a job that raised an error so it can be retried, up to MAX_ATTEMPTS times.
+
+    Args:
+        connection (sqlite3.Connection): Queue connection
+        position (int): Position of the job
+        worker_id (str): Identifier of the worker that ran the job
+        error (str): Description of the error
+    """
+    connection.execute(
+        '''UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                           error = ?, lease_expires = NULL
+           WHERE position = ? AND worker = ? AND status = 'running' ''',
+        (MAX_ATTEMPTS, error, position, worker_id),
+    )
+
+
+def get_job_counts(connection):
+    """
+    Counts jobs by status.
+
+    Args:
+        connection (sqlite3.Connection): Queue connection
+
+    Returns:
+        dict: Number of jobs in each status
+    """
+    return dict(connection.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status'))
+
+
+def get_results(connection):
+    """
+    Returns the results of all jobs in queue order, decoded one at a time as they are iterated.
+
+    Args:
+        connection (sqlite3.Connection): Queue connection
+
+    Returns:
+        generator: Result dict of each job, in the order the jobs were queued
+
+    Raises:
+        ValueError: If any job has not finished successfully
+    """
+    fail_expired_jobs(connection, time.time())
+    counts = get_job_counts(connection)
+    unfinished = sum(count for status, count in counts.items() if status != 'done')
+    if unfinished:
+        raise ValueError(f'{unfinished} jobs have not finished: {counts}')
+    cursor = connection.execute('SELECT result FROM jobs ORDER BY position')
+    return (json.loads(result) for (result,) in cursor)
+
+
+class RowCollector:
+    """
+    Stands in for a csv writer, keeping rows in memory so they can be stored with a job's result.
+    """
+
+    def __init__(self):
+        self.rows = []
+
+    def writerow(self, row):
+        self.rows.append(list(row))